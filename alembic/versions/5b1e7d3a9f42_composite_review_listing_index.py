@@ -0,0 +1,35 @@
+"""Composite review listing index
+
+Revision ID: 5b1e7d3a9f42
+Revises: c94d2196a89c
+Create Date: 2026-10-16 09:12:40.318275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e7d3a9f42'
+down_revision: Union[str, None] = 'c94d2196a89c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (book_id, created_at DESC, id DESC) serves the newest-first keyset scan
+    # for one book; its book_id prefix makes idx_reviews_book_id redundant.
+    op.create_index(
+        'idx_reviews_book_created_id',
+        'reviews',
+        ['book_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.drop_index('idx_reviews_book_id', table_name='reviews')
+
+
+def downgrade() -> None:
+    op.create_index('idx_reviews_book_id', 'reviews', ['book_id'], unique=False)
+    op.drop_index('idx_reviews_book_created_id', table_name='reviews')
@@ -0,0 +1,44 @@
+"""Book rating aggregates
+
+Revision ID: 8e2c4f61a0d7
+Revises: 5b1e7d3a9f42
+Create Date: 2026-10-16 10:03:11.527904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2c4f61a0d7'
+down_revision: Union[str, None] = '5b1e7d3a9f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+AGGREGATE_COLUMNS = ['review_count', 'rating_sum'] + [f'rating_{n}_count' for n in range(1, 6)]
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('books') as batch_op:
+        for name in AGGREGATE_COLUMNS:
+            batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from existing reviews
+    histogram = ', '.join(
+        f"rating_{n}_count = (SELECT COUNT(*) FROM reviews WHERE reviews.book_id = books.id AND reviews.rating = {n})"
+        for n in range(1, 6)
+    )
+    op.execute(
+        "UPDATE books SET "
+        "review_count = (SELECT COUNT(*) FROM reviews WHERE reviews.book_id = books.id), "
+        "rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM reviews WHERE reviews.book_id = books.id), "
+        + histogram
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('books') as batch_op:
+        for name in reversed(AGGREGATE_COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,39 @@
+"""Service stats counters
+
+Revision ID: a37f90c2d815
+Revises: 8e2c4f61a0d7
+Create Date: 2026-10-16 11:20:47.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a37f90c2d815'
+down_revision: Union[str, None] = '8e2c4f61a0d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('service_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total_books', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_reviews', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Seed the single totals row from existing data
+    op.execute(
+        "INSERT INTO service_stats (id, total_books, total_reviews, rating_sum) VALUES (1, "
+        "(SELECT COUNT(*) FROM books), "
+        "(SELECT COUNT(*) FROM reviews), "
+        "(SELECT COALESCE(SUM(rating), 0) FROM reviews))"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('service_stats')
@@ -0,0 +1,71 @@
+"""Book full-text search
+
+Revision ID: d5a8b3e07c19
+Revises: a37f90c2d815
+Create Date: 2026-10-16 12:41:05.662830
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8b3e07c19'
+down_revision: Union[str, None] = 'a37f90c2d815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_TRIGGERS = ['books_fts_ai', 'books_fts_ad', 'books_fts_au']
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "ALTER TABLE books ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+            ") STORED"
+        )
+        op.execute("CREATE INDEX idx_books_search_vector ON books USING GIN (search_vector)")
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE books_fts USING fts5("
+        "title, author, description, "
+        "content='books', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute("INSERT INTO books_fts(books_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')")
+    op.execute(
+        "CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+        "INSERT INTO books_fts(rowid, title, author, description) "
+        "VALUES (new.id, new.title, new.author, new.description); END"
+    )
+    op.execute(
+        "CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, description) "
+        "VALUES ('delete', old.id, old.title, old.author, old.description); END"
+    )
+    op.execute(
+        "CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, description ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, description) "
+        "VALUES ('delete', old.id, old.title, old.author, old.description); "
+        "INSERT INTO books_fts(rowid, title, author, description) "
+        "VALUES (new.id, new.title, new.author, new.description); END"
+    )
+    # Index the existing catalog
+    op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS idx_books_search_vector")
+        op.execute("ALTER TABLE books DROP COLUMN IF EXISTS search_vector")
+        return
+
+    for trigger in SQLITE_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS books_fts")
@@ -0,0 +1,293 @@
+"""
+Load benchmarks against a running Book Review Service
+
+Usage:
+    uvicorn main:app --port 8000 &
+    python benchmark.py throughput --path /books --concurrency 1 8 32 64
+
+    # In-process, no server needed
+    python benchmark.py cache-hit --books 10000 100000 1000000
+    python benchmark.py sqlite-mixed --readers 8 --writers 2 --seconds 10
+    python benchmark.py group-commit --reviews 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+DEFAULT_URL = "http://localhost:8000"
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_load(client: httpx.AsyncClient, path: str, requests: int, concurrency: int):
+    """Issue `requests` GETs with at most `concurrency` in flight. Returns (elapsed, latencies, errors)"""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, errors
+
+
+async def throughput(args):
+    """Measure requests/second for one endpoint as concurrency grows"""
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        # Warm up connections and caches
+        await run_load(client, args.path, min(50, args.requests), max(args.concurrency))
+
+        print(f"📈 GET {args.path} — {args.requests} requests per level")
+        print(f"{'concurrency':>12} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for concurrency in args.concurrency:
+            elapsed, latencies, errors = await run_load(client, args.path, args.requests, concurrency)
+            print(
+                f"{concurrency:>12} {args.requests / elapsed:>10.1f} "
+                f"{statistics.median(latencies) * 1000:>9.2f} "
+                f"{percentile(latencies, 99) * 1000:>9.2f} {errors:>7}"
+            )
+
+
+def legacy_hit(payload: bytes, adapter) -> bytes:
+    """Cache hit as served before: json.loads, then response_model validation and re-serialization"""
+    from fastapi.responses import JSONResponse
+
+    content = adapter.dump_python(adapter.validate_python(json.loads(payload)), mode="json")
+    return JSONResponse(content).body
+
+
+def raw_hit(payload: bytes, adapter) -> bytes:
+    """Cache hit as served now: the cached body as-is"""
+    from fastapi import Response
+
+    return Response(content=payload, media_type="application/json").body
+
+
+def time_hit(serve, payload: bytes, adapter, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        serve(payload, adapter)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+async def cache_hit(args):
+    """Compare the cost of serving one cached listing of N books, old path vs. raw bytes"""
+    from pydantic import TypeAdapter
+    from schemas import Book, BookPage
+
+    adapter = TypeAdapter(BookPage)
+    now = datetime.now(timezone.utc)
+    print("📈 Cache hit latency for one cached response of N books (median)")
+    print(f"{'books':>10} {'MB':>8} {'before ms':>11} {'after ms':>10} {'speedup':>9}")
+    for count in args.books:
+        items = [
+            Book(
+                id=i, title=f"Book {i}", author=f"Author {i % 1000}", isbn=f"{i:013d}",
+                publication_year=1900 + i % 125, description="A book description " * 4,
+                created_at=now, review_count=i % 50,
+                average_rating=round(1 + i % 400 / 100, 2), rating_histogram=[i % 7, 1, 2, 3, 4],
+            )
+            for i in range(1, count + 1)
+        ]
+        payload = BookPage(items=items, next_cursor=None).model_dump_json().encode()
+        del items
+        # Big catalogs take seconds per legacy pass; don't repeat those as often
+        repeats = max(1, args.repeats * 10_000 // count)
+        before = time_hit(legacy_hit, payload, adapter, repeats)
+        after = time_hit(raw_hit, payload, adapter, args.repeats)
+        print(
+            f"{count:>10} {len(payload) / 1e6:>8.1f} {before * 1000:>11.2f} "
+            f"{after * 1000:>10.4f} {before / after:>8.0f}x"
+        )
+
+
+def mixed_load(profile: str, path: str, args):
+    """Run readers and writers against a fresh SQLite file for args.seconds. Returns per-kind stats"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from database import SQLITE_PRAGMAS, install_sqlite_pragmas
+    from models import Base, Book
+    from crud import create_review, get_review_records
+    from schemas import ReviewCreate
+
+    engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False},
+        pool_size=args.readers + args.writers,
+    )
+    if profile == "performance":
+        install_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autoflush=False, bind=engine)
+    with Session() as db:
+        db.add_all(Book(title=f"Book {i}", author=f"Author {i}") for i in range(args.seed_books))
+        db.commit()
+
+    deadline = time.perf_counter() + args.seconds
+    results = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+
+    def worker(kind):
+        rng = random.Random()
+        latencies = []
+        with Session() as db:
+            while time.perf_counter() < deadline:
+                book_id = rng.randint(1, args.seed_books)
+                started = time.perf_counter()
+                try:
+                    if kind == "read":
+                        get_review_records(db, book_id, limit=20)
+                        db.rollback()  # end the read transaction, as a request would
+                    else:
+                        create_review(db, ReviewCreate(reviewer_name="Bench", rating=rng.randint(1, 5)), book_id)
+                except Exception:
+                    db.rollback()
+                    errors[kind] += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+        results[kind].extend(latencies)
+
+    threads = [threading.Thread(target=worker, args=("read",)) for _ in range(args.readers)]
+    threads += [threading.Thread(target=worker, args=("write",)) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return {
+        kind: (len(latencies) / args.seconds, percentile(latencies, 99) * 1000 if latencies else 0.0, errors[kind])
+        for kind, latencies in results.items()
+    }
+
+
+async def sqlite_mixed(args):
+    """Compare mixed read/write throughput with SQLite's defaults vs. the performance profile"""
+    print(f"📈 SQLite mixed load — {args.readers} readers, {args.writers} writers, {args.seconds}s per profile")
+    print(f"{'profile':>12} {'reads/s':>10} {'read p99 ms':>12} {'writes/s':>10} {'write p99 ms':>13} {'errors':>7}")
+    for profile in ("default", "performance"):
+        with tempfile.TemporaryDirectory() as directory:
+            stats = await asyncio.to_thread(mixed_load, profile, os.path.join(directory, "bench.db"), args)
+        (reads, read_p99, read_errors), (writes, write_p99, write_errors) = stats["read"], stats["write"]
+        print(
+            f"{profile:>12} {reads:>10.0f} {read_p99:>12.2f} {writes:>10.0f} {write_p99:>13.2f} "
+            f"{read_errors + write_errors:>7}"
+        )
+
+
+async def group_commit(args):
+    """Burst of concurrent review writes: one commit per review vs. the group-commit writer"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from database import SQLITE_PRAGMAS, install_sqlite_pragmas
+    from models import Base, Book
+    from crud import create_review_async, create_review_records_async
+    from schemas import ReviewCreate, ReviewImport
+    from group_commit import GroupCommitter
+
+    print(f"📈 {args.reviews} review writes, {args.concurrency} in flight, SQLite performance profile")
+    print(f"{'mode':>14} {'writes/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode in ("per-request", "group-commit"):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}")
+            install_sqlite_pragmas(engine.sync_engine, SQLITE_PRAGMAS)
+            Session = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            async with Session() as db:
+                db.add_all(Book(title=f"Book {i}", author="Author") for i in range(100))
+                await db.commit()
+            writer = GroupCommitter(Session, create_review_records_async)
+
+            async def write(i):
+                review = ReviewCreate(reviewer_name="Bench", rating=i % 5 + 1)
+                if mode == "group-commit":
+                    await writer.submit(ReviewImport(**review.model_dump(), book_id=i % 100 + 1))
+                else:
+                    async with Session() as db:
+                        await create_review_async(db, review, i % 100 + 1)
+
+            latencies = []
+            errors = 0
+            remaining = iter(range(args.reviews))
+
+            async def worker():
+                nonlocal errors
+                for i in remaining:
+                    started = time.perf_counter()
+                    try:
+                        await write(i)
+                    except Exception:
+                        errors += 1
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            await writer.close()
+            await engine.dispose()
+        print(
+            f"{mode:>14} {args.reviews / elapsed:>10.0f} {statistics.median(latencies) * 1000:>9.2f} "
+            f"{percentile(latencies, 99) * 1000:>9.2f} {errors:>7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=DEFAULT_URL, help="Base URL of the running service")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    throughput_parser = subparsers.add_parser("throughput", help="Requests/second vs. concurrency for one endpoint")
+    throughput_parser.add_argument("--path", default="/books")
+    throughput_parser.add_argument("--requests", type=int, default=1000)
+    throughput_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    throughput_parser.set_defaults(handler=throughput)
+
+    cache_hit_parser = subparsers.add_parser("cache-hit", help="Serving a cached response: json.loads + response_model vs. raw bytes")
+    cache_hit_parser.add_argument("--books", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    cache_hit_parser.add_argument("--repeats", type=int, default=20)
+    cache_hit_parser.set_defaults(handler=cache_hit)
+
+    sqlite_parser = subparsers.add_parser("sqlite-mixed", help="Mixed read/write throughput: SQLite defaults vs. performance profile")
+    sqlite_parser.add_argument("--readers", type=int, default=8)
+    sqlite_parser.add_argument("--writers", type=int, default=2)
+    sqlite_parser.add_argument("--seconds", type=float, default=10)
+    sqlite_parser.add_argument("--seed-books", type=int, default=1000)
+    sqlite_parser.set_defaults(handler=sqlite_mixed)
+
+    group_commit_parser = subparsers.add_parser("group-commit", help="Burst review writes: commit per review vs. group commit")
+    group_commit_parser.add_argument("--reviews", type=int, default=2000)
+    group_commit_parser.add_argument("--concurrency", type=int, default=100)
+    group_commit_parser.set_defaults(handler=group_commit)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
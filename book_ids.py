@@ -0,0 +1,87 @@
+# book_ids.py
+"""
+In-process record of which book ids exist, so existence checks in front of
+cached reads don't cost a database query.
+
+Known ids are kept in a bitmap indexed by id: book ids are dense
+autoincrement integers, so one bit per id (125 KB per million books) is
+smaller than a Bloom filter at any useful error rate, and exact. Books are
+never deleted, so an id once seen stays valid for the life of the worker.
+
+Ids found missing are remembered for BOOK_IDS_NEGATIVE_TTL seconds, so
+repeated lookups of unknown ids are answered from memory too. Another worker
+may create the book meanwhile; whoever creates books must call
+forget_missing() on every worker (see main.py, which does it through a
+cache invalidation).
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+NEGATIVE_TTL = float(os.getenv("BOOK_IDS_NEGATIVE_TTL", "30"))
+NEGATIVE_MAX_ENTRIES = int(os.getenv("BOOK_IDS_NEGATIVE_MAX_ENTRIES", "100000"))
+
+
+class BookIdSet:
+    """Known book ids as a bitmap, plus a bounded TTL cache of ids known to be missing.
+
+    Only touched from the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, negative_ttl: float = NEGATIVE_TTL, max_negative_entries: int = NEGATIVE_MAX_ENTRIES):
+        self.negative_ttl = negative_ttl
+        self.max_negative_entries = max_negative_entries
+        self._bits = bytearray()
+        self._missing = OrderedDict()  # book_id -> expires_at (monotonic)
+
+    def __contains__(self, book_id: int) -> bool:
+        index = book_id >> 3
+        return 0 <= index < len(self._bits) and bool(self._bits[index] >> (book_id & 7) & 1)
+
+    def add(self, book_id: int):
+        index = book_id >> 3
+        if index >= len(self._bits):
+            # Grow geometrically so sequential inserts don't copy on every new byte
+            self._bits.extend(bytes(max(index + 1 - len(self._bits), len(self._bits))))
+        self._bits[index] |= 1 << (book_id & 7)
+        self._missing.pop(book_id, None)
+
+    def is_missing(self, book_id: int) -> bool:
+        """Whether `book_id` was recently found not to exist."""
+        expires_at = self._missing.get(book_id)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._missing[book_id]
+            return False
+        return True
+
+    def mark_missing(self, book_id: int):
+        self._missing[book_id] = time.monotonic() + self.negative_ttl
+        self._missing.move_to_end(book_id)
+        while len(self._missing) > self.max_negative_entries:
+            self._missing.popitem(last=False)
+
+    def forget_missing(self):
+        """Drop every negative entry, e.g. because books were created."""
+        self._missing.clear()
+
+    async def exists(self, book_id: int, lookup: Callable[[int], Awaitable[bool]]) -> bool:
+        """Whether the book exists, calling `lookup` (the database) only for ids not seen recently."""
+        if book_id in self:
+            return True
+        if book_id < 0 or self.is_missing(book_id):
+            return False
+        if await lookup(book_id):
+            self.add(book_id)
+            return True
+        self.mark_missing(book_id)
+        return False
+
+    def clear(self):
+        self._bits = bytearray()
+        self._missing.clear()
+
+
+book_ids = BookIdSet()
@@ -1,23 +1,612 @@
 # cache.py
+"""
+Two-tier response cache: a bounded in-process LRU/TTL layer (L1) in front of
+Redis (L2).
 
-import redis
+Values are final response bodies (bytes), served as-is on a hit. Bodies of
+at least CACHE_COMPRESS_MIN_BYTES are gzip-compressed once when stored, and
+readers always get the stored form back (see is_compressed). Entries
+carry a soft expiry inside the stored value and a hard expiry as the Redis
+TTL. Past the soft expiry a stale value is still served while one
+background task refreshes it; only a hard miss makes a request wait.
+
+Misses are rebuilt single-flight: concurrent misses for a key in one worker
+share one build through an asyncio future, and across workers a short Redis
+lock elects one builder while the others poll for its result.
+
+Entries carry tags naming the data they were built from, e.g. "books",
+"book:42" or "reviews:42". Every tag has a generation counter in Redis that is
+embedded in the keys of its entries ("books:page:50:start@books=7"), so
+invalidating a tag is a single INCR: every entry built under the old
+generation simply stops being addressed and ages out by its TTL, with no
+key scans and no race against a rebuild that was still in flight. Workers
+keep the generations they have seen in memory for up to the L1 TTL; an
+invalidation is published on a pub/sub channel so every other worker
+forgets the tag's generation and drops its L1 copies at once.
+"""
+import asyncio
+import gzip
+import json
 import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from database import redis_binary_client
+from metrics import cache_errors, cache_key_family, cache_requests, registry
 
 logger = logging.getLogger(__name__)
 
-try:
-    # Create a Redis client connection
-    redis_client = redis.Redis(
-        host="localhost",
-        port=6379,
-        db=0,
-        decode_responses=True  # ensures you get strings instead of bytes
-    )
-
-    # Test the connection
-    redis_client.ping()
-    logging.info("✅ Connected to Redis")
-
-except redis.exceptions.ConnectionError:
-    redis_client = None
-    logging.warning("⚠️ Redis connection failed - running without cache")
+L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1024"))
+L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+L1_TTL = float(os.getenv("CACHE_L1_TTL", "30"))
+INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+SOFT_TTL = int(os.getenv("CACHE_SOFT_TTL", "300"))
+HARD_TTL = int(os.getenv("CACHE_HARD_TTL", "3600"))
+REBUILD_LOCK_TTL_MS = int(os.getenv("CACHE_REBUILD_LOCK_TTL_MS", "5000"))
+REBUILD_POLL_INTERVAL = float(os.getenv("CACHE_REBUILD_POLL_INTERVAL", "0.05"))
+TAG_MAX_ENTRIES = int(os.getenv("CACHE_TAG_MAX_ENTRIES", "10000"))
+GENERATION_READ_ATTEMPTS = 3
+TAG_KEY_PREFIX = "tag:"  # Redis counter holding a tag's generation
+COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.getenv("CACHE_COMPRESS_LEVEL", "6"))
+GZIP_MAGIC = b"\x1f\x8b"  # JSON bodies can never start with these bytes
+
+# Delete the rebuild lock only if we still own it
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def compress_body(body: bytes) -> bytes:
+    """Gzip a body worth compressing; smaller bodies are returned unchanged."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body
+    # mtime=0 keeps the output deterministic for identical bodies
+    return gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def is_compressed(body: bytes) -> bool:
+    return body[:2] == GZIP_MAGIC
+
+
+def decompress_body(body: bytes) -> bytes:
+    return gzip.decompress(body) if is_compressed(body) else body
+
+
+class LocalCache:
+    """Bounded in-process LRU cache with per-entry TTL and tag invalidation.
+
+    Only touched from the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES, max_bytes: int = L1_MAX_BYTES, ttl: float = L1_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, size, tags)
+        self._tags = {}  # tag -> set of keys
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value, ttl: Optional[float] = None, tags: Iterable[str] = (), size: Optional[int] = None):
+        size = len(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        self.delete(key)
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + ttl, value, size, tags)
+        self._bytes += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        # Evict least recently used entries until within bounds
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self.delete(next(iter(self._entries)))
+
+    def delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[2]
+        for tag in entry[3]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def drop_tag(self, tag: str):
+        for key in list(self._tags.get(tag, ())):
+            self.delete(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+        self._bytes = 0
+
+
+class TwoTierCache:
+    """L1 LocalCache in front of Redis, with tag invalidation shared across workers.
+
+    Redis failures are logged and treated as misses, matching the rest of the service.
+    """
+
+    def __init__(self, redis, local: Optional[LocalCache] = None, channel: str = INVALIDATION_CHANNEL):
+        self.redis = redis
+        self.local = local if local is not None else LocalCache()
+        self.channel = channel
+        self._listener = None
+        self._inflight = {}  # versioned key -> future resolving to the rebuilt value
+        self._refreshes = set()  # background refresh tasks, kept referenced until done
+        self._generations = OrderedDict()  # tag -> (generation, checked_at)
+        self._invalidated_at = OrderedDict()  # tag -> when this worker last heard it was invalidated
+        self._invalidation_hooks = []
+
+    # An entry is (fresh_until, body). L1 holds the tuple so a hit returns the
+    # body without copying; Redis holds "<fresh_until>|<body>".
+
+    @staticmethod
+    def _dump(entry: Tuple[float, bytes]) -> bytes:
+        return f"{entry[0]:.3f}|".encode() + entry[1]
+
+    @staticmethod
+    def _load(raw) -> Optional[Tuple[float, bytes]]:
+        """Parse an entry read from Redis; None if absent or unreadable."""
+        if raw is None:
+            return None
+        if isinstance(raw, str):
+            raw = raw.encode()
+        fresh_until, sep, body = raw.partition(b"|")
+        try:
+            return (float(fresh_until), body) if sep else None
+        except ValueError:
+            return None
+
+    def _remember(self, key: str, entry: Tuple[float, bytes], tags, ttl: Optional[float] = None):
+        self.local.set(key, entry, ttl=ttl, tags=tags, size=len(entry[1]))
+
+    def _remember_generation(self, tag: str, generation: int, checked_at: Optional[float] = None):
+        # Generations only move forward: a reply that raced an INCR must not roll one back
+        known = self._generations.get(tag)
+        if known is not None and known[0] > generation:
+            generation = known[0]
+        self._generations[tag] = (generation, time.monotonic() if checked_at is None else checked_at)
+        self._generations.move_to_end(tag)
+        while len(self._generations) > TAG_MAX_ENTRIES:
+            self._generations.popitem(last=False)
+
+    async def _load_generations(self, tags: Iterable[str]):
+        """Read the generations of any `tags` not seen within the L1 TTL, in one MGET.
+
+        A tag invalidated while its MGET was in flight may have been read
+        before the publisher's INCR, so it is read again.
+        """
+        cutoff = time.monotonic() - self.local.ttl
+        unknown = list({tag for tag in tags if self._generations.get(tag, (0, cutoff))[1] <= cutoff})
+        for attempt in range(GENERATION_READ_ATTEMPTS):
+            if not unknown or not self.redis:
+                return
+            started = time.monotonic()
+            try:
+                counters = await self.redis.mget([TAG_KEY_PREFIX + tag for tag in unknown])
+            except Exception as e:
+                cache_errors.inc("generations")
+                logger.warning(f"⚠️ Redis unavailable reading generations for {', '.join(unknown)}: {e}")
+                return
+            raced = []
+            for tag, counter in zip(unknown, counters):
+                if self._invalidated_at.get(tag, float("-inf")) >= started:
+                    raced.append((tag, int(counter or 0)))
+                else:
+                    self._remember_generation(tag, int(counter or 0))
+            unknown = [tag for tag, _ in raced]
+        # Still racing invalidations: use what was read, but read it again next time
+        for tag, generation in raced:
+            self._remember_generation(tag, generation, checked_at=float("-inf"))
+
+    def _compose_key(self, key: str, tags: Tuple[str, ...]) -> str:
+        if not tags:
+            return key
+        generations = ",".join(f"{tag}={self._generations.get(tag, (0,))[0]}" for tag in tags)
+        return f"{key}@{generations}"
+
+    async def _versioned_key(self, key: str, tags: Iterable[str]) -> str:
+        """Embed the current generation of each tag in `key`."""
+        tags = tuple(tags)
+        await self._load_generations(tags)
+        return self._compose_key(key, tags)
+
+    async def _lookup(self, key: str, tags: Iterable[str] = ()) -> Optional[Tuple[float, bytes]]:
+        family = cache_key_family(key)
+        entry = self.local.get(key)
+        if entry is not None:
+            logger.debug(f"📦 L1 cache hit - {key}")
+            cache_requests.inc(family, "l1_hit")
+            return entry
+        if not self.redis:
+            cache_requests.inc(family, "miss")
+            return None
+        try:
+            entry = self._load(await self.redis.get(key))
+        except Exception as e:
+            cache_errors.inc("get")
+            cache_requests.inc(family, "miss")
+            logger.warning(f"⚠️ Redis unavailable during GET {key}: {e}")
+            return None
+        if entry is not None:
+            logger.info(f"📦 Cache hit - {key}")
+            cache_requests.inc(family, "hit")
+            self._remember(key, entry, tags)
+        else:
+            cache_requests.inc(family, "miss")
+        return entry
+
+    async def get(self, key: str, tags: Iterable[str] = ()) -> Optional[bytes]:
+        """Get a cached value, fresh or stale, without triggering a rebuild."""
+        entry = await self._lookup(await self._versioned_key(key, tags), tags)
+        return entry[1] if entry is not None else None
+
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        tags: Iterable[str] = (),
+        soft_ttl: int = SOFT_TTL,
+        hard_ttl: int = HARD_TTL,
+    ):
+        """Cache a value that is fresh for `soft_ttl` seconds and servable (stale) for `hard_ttl`."""
+        return await self._store(await self._versioned_key(key, tags), value, tuple(tags), soft_ttl, hard_ttl)
+
+    async def _store(self, key: str, value: bytes, tags, soft_ttl: int, hard_ttl: int) -> bytes:
+        """Store `value`, compressed if large enough, and return the stored form."""
+        entry = (time.time() + soft_ttl, compress_body(value))
+        self._remember(key, entry, tags, ttl=hard_ttl)
+        if self.redis:
+            try:
+                await self.redis.setex(key, hard_ttl, self._dump(entry))
+            except Exception as e:
+                cache_errors.inc("set")
+                logger.warning(f"⚠️ Failed to cache {key}: {e}")
+        return entry[1]
+
+    async def get_or_build(
+        self,
+        key: str,
+        build: Callable[[], Awaitable[bytes]],
+        tags: Iterable[str] = (),
+        soft_ttl: int = SOFT_TTL,
+        hard_ttl: int = HARD_TTL,
+    ) -> bytes:
+        """Get a cached value, or run `build` to produce and cache it, at most once at a time per key.
+
+        A stale value (past `soft_ttl`) is returned immediately while `build`
+        refreshes it in the background, so `build` must not depend on the
+        caller's request-scoped resources. Only a hard miss blocks.
+
+        Returns the stored form of the value, which may be gzip-compressed.
+        """
+        tags = tuple(tags)
+        key = await self._versioned_key(key, tags)
+        entry = await self._lookup(key, tags)
+        if entry is not None:
+            if entry[0] <= time.time():
+                self._refresh_in_background(key, build, tags, soft_ttl, hard_ttl)
+            return entry[1]
+
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                value = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Only swallow the leader's cancellation, never our own
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                continue
+            if value is not None:
+                return value
+            # A background refresh that found another worker rebuilding gives
+            # up with None; the first waiter back leads a build of its own
+
+        # A build may have completed while we awaited Redis above
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry[1]
+
+        return await self._lead_build(key, build, tags, soft_ttl, hard_ttl, wait_for_others=True)
+
+    async def get_or_build_many(
+        self,
+        entries: Sequence[Tuple[str, Tuple[str, ...]]],
+        build_many: Callable[[List[int]], Awaitable[Dict[int, bytes]]],
+        soft_ttl: int = SOFT_TTL,
+        hard_ttl: int = HARD_TTL,
+    ) -> List[Optional[bytes]]:
+        """Multi-key get_or_build for (key, tags) entries, in about one Redis round trip each way.
+
+        Generations are read with one MGET, L1 misses with one MGET, and
+        `build_many` gets the positions of every entry still missing (stale
+        entries count as missing) and returns {position: value} for those that
+        exist; those are written back in one pipeline. Returns the stored form
+        of each value in order, None where nothing exists. Unlike
+        get_or_build, concurrent callers are not coalesced.
+        """
+        await self._load_generations(tag for _, tags in entries for tag in tags)
+        keys = [self._compose_key(key, tuple(tags)) for key, tags in entries]
+        now = time.time()
+        values: List[Optional[bytes]] = [None] * len(entries)
+        remote = []
+        for position, key in enumerate(keys):
+            entry = self.local.get(key)
+            if entry is not None and entry[0] > now:
+                values[position] = entry[1]
+                cache_requests.inc(cache_key_family(key), "l1_hit")
+            else:
+                remote.append(position)
+
+        if remote and self.redis:
+            try:
+                found = await self.redis.mget([keys[position] for position in remote])
+            except Exception as e:
+                cache_errors.inc("mget")
+                logger.warning(f"⚠️ Redis unavailable during MGET of {len(remote)} keys: {e}")
+                found = [None] * len(remote)
+            missing = []
+            for position, raw in zip(remote, found):
+                entry = self._load(raw)
+                if entry is not None and entry[0] > now:
+                    self._remember(keys[position], entry, entries[position][1])
+                    values[position] = entry[1]
+                    cache_requests.inc(cache_key_family(keys[position]), "hit")
+                else:
+                    missing.append(position)
+        else:
+            missing = remote
+        for position in missing:
+            cache_requests.inc(cache_key_family(keys[position]), "miss")
+        if not missing:
+            return values
+
+        # Keys were versioned before the build, as in get_or_build
+        built = await build_many(missing)
+        pipe = self.redis.pipeline() if self.redis else None
+        for position, value in built.items():
+            entry = (time.time() + soft_ttl, compress_body(value))
+            self._remember(keys[position], entry, entries[position][1], ttl=hard_ttl)
+            values[position] = entry[1]
+            if pipe is not None:
+                pipe.setex(keys[position], hard_ttl, self._dump(entry))
+        if pipe is not None and built:
+            try:
+                await pipe.execute()
+            except Exception as e:
+                cache_errors.inc("set")
+                logger.warning(f"⚠️ Failed to cache {len(built)} rebuilt entries: {e}")
+        return values
+
+    async def _lead_build(self, key, build, tags, soft_ttl, hard_ttl, wait_for_others: bool) -> Optional[bytes]:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._build_once(key, build, tags, soft_ttl, hard_ttl, wait_for_others)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn if there are none
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def _build_once(self, key, build, tags, soft_ttl, hard_ttl, wait_for_others: bool) -> Optional[bytes]:
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        locked = await self._acquire_lock(lock_key, token)
+        if locked is False:
+            if not wait_for_others:
+                # Another worker is already refreshing this key
+                return None
+            # Another worker holds the lock: wait for its result
+            value = await self._wait_for(key, tags)
+            if value is not None:
+                return value
+            logger.warning(f"⚠️ Gave up waiting for rebuild of {key}; rebuilding locally")
+        try:
+            value = await build()
+            # Stored under the generations read before the build: if a tag was
+            # invalidated meanwhile, this entry is already unreachable
+            return await self._store(key, value, tags, soft_ttl, hard_ttl)
+        finally:
+            if locked:
+                await self._release_lock(lock_key, token)
+
+    def _refresh_in_background(self, key, build, tags, soft_ttl, hard_ttl):
+        if key in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._lead_build(key, build, tags, soft_ttl, hard_ttl, wait_for_others=False)
+                logger.info(f"🔄 Refreshed stale cache entry {key}")
+            except Exception as e:
+                logger.warning(f"⚠️ Background refresh of {key} failed: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def _acquire_lock(self, lock_key: str, token: str) -> Optional[bool]:
+        """True if acquired, False if held elsewhere, None if Redis can't arbitrate."""
+        if not self.redis:
+            return None
+        try:
+            return bool(await self.redis.set(lock_key, token, nx=True, px=REBUILD_LOCK_TTL_MS))
+        except Exception as e:
+            cache_errors.inc("lock")
+            logger.warning(f"⚠️ Failed to take rebuild lock {lock_key}: {e}")
+            return None
+
+    async def _release_lock(self, lock_key: str, token: str):
+        try:
+            await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to release rebuild lock {lock_key}: {e}")
+
+    async def _wait_for(self, key: str, tags) -> Optional[bytes]:
+        deadline = time.monotonic() + REBUILD_LOCK_TTL_MS / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(REBUILD_POLL_INTERVAL)
+            try:
+                entry = self._load(await self.redis.get(key))
+            except Exception as e:
+                logger.warning(f"⚠️ Redis unavailable while waiting for {key}: {e}")
+                return None
+            if entry is not None:
+                self._remember(key, entry, tags)
+                return entry[1]
+        return None
+
+    def add_invalidation_hook(self, hook: Callable[[Optional[Sequence[str]]], None]):
+        """Also call `hook(tags)` whenever tags are invalidated, by this worker or another.
+
+        `hook(None)` means invalidations may have been missed and any state
+        derived from them should be dropped. Hooks run on the event loop and
+        must not block.
+        """
+        self._invalidation_hooks.append(hook)
+
+    def _run_invalidation_hooks(self, tags: Optional[Sequence[str]]):
+        for hook in self._invalidation_hooks:
+            try:
+                hook(tags)
+            except Exception as e:
+                logger.warning(f"⚠️ Cache invalidation hook {hook!r} failed: {e}")
+
+    def _forget_tags(self, tags: Sequence[str]):
+        now = time.monotonic()
+        for tag in tags:
+            self.local.drop_tag(tag)
+            self._generations.pop(tag, None)
+            self._invalidated_at[tag] = now
+            self._invalidated_at.move_to_end(tag)
+        while len(self._invalidated_at) > TAG_MAX_ENTRIES:
+            self._invalidated_at.popitem(last=False)
+        self._run_invalidation_hooks(tags)
+
+    def invalidated_within(self, tags: Iterable[str], seconds: float) -> bool:
+        """Whether any of `tags` was invalidated, by this worker or another, in the last `seconds`."""
+        cutoff = time.monotonic() - seconds
+        return any(self._invalidated_at.get(tag, cutoff) > cutoff for tag in tags)
+
+    async def invalidate_tags(self, *tags: str):
+        """Invalidate every entry carrying any of `tags`, in this worker and all others.
+
+        One INCR per tag, pipelined with the pub/sub notice into a single round trip.
+        """
+        self._forget_tags(tags)
+        if not self.redis:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            for tag in tags:
+                pipe.incr(TAG_KEY_PREFIX + tag)
+            pipe.publish(self.channel, json.dumps({"tags": list(tags)}))
+            results = await pipe.execute()
+            for tag, generation in zip(tags, results):
+                self._remember_generation(tag, generation)
+            logger.info(f"🧹 Invalidated cache tags {', '.join(tags)}")
+        except Exception as e:
+            cache_errors.inc("invalidate")
+            logger.warning(f"⚠️ Failed to invalidate cache tags {', '.join(tags)}: {e}")
+
+    def _apply_invalidation(self, data: str):
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ Ignoring malformed cache invalidation: {data!r}")
+            return
+        # The publisher already bumped the generations; re-read them on next use
+        self._forget_tags(tuple(message.get("tags", ())))
+
+    async def _listen(self):
+        backoff = 1.0
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                # Invalidations published while we were disconnected are lost
+                self.local.clear()
+                self._generations.clear()
+                self._run_invalidation_hooks(None)
+                backoff = 1.0
+                logger.info(f"📡 Listening for cache invalidations on {self.channel}")
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message:
+                        self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Cache invalidation listener disconnected: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    def start_listener(self):
+        if self.redis and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop_listener(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def close(self):
+        """Stop the invalidation listener and any background refreshes."""
+        await self.stop_listener()
+        for task in list(self._refreshes):
+            task.cancel()
+        await asyncio.gather(*self._refreshes, return_exceptions=True)
+
+
+response_cache = TwoTierCache(redis_binary_client)
+
+registry.gauge("cache_l1_entries", "Entries in this worker's L1 cache.", collect=lambda: {(): len(response_cache.local)})
+registry.gauge("cache_l1_bytes", "Bytes held in this worker's L1 cache.", collect=lambda: {(): response_cache.local.size_bytes})
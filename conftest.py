@@ -1,7 +1,9 @@
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from database import Base, get_db
+from sqlalchemy.pool import NullPool
+from database import Base, get_async_db, get_async_session_factory, get_session_factory
 from main import app
 from fastapi.testclient import TestClient
 
@@ -12,19 +14,20 @@ engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Create tables before any test
 Base.metadata.create_all(bind=engine)
 
 # Dependency override
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_async_session_factory] = lambda: TestingAsyncSessionLocal
+app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
 
 @pytest.fixture(scope="module")
 def client():
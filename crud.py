@@ -1,32 +1,546 @@
-from sqlalchemy.orm import Session
-from models import Book, Review
-from schemas import BookCreate, ReviewCreate
-from typing import List
+from sqlalchemy import and_, or_, bindparam, case, func, insert, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from models import Book, Review, ServiceStats
+from schemas import BookCreate, ReviewCreate, ReviewImport
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from datetime import datetime
 
-def get_books(db: Session) -> List[Book]:
-    """Get all books from database."""
-    return db.query(Book).all()
+STATS_ROW_ID = 1
+
+# Statement builders shared by the sync functions (scripts, CLI) and their
+# async variants (request handlers)
+
+def _books_page_stmt(limit: Optional[int], after_id: Optional[int], columns=None):
+    stmt = select(*columns) if columns else select(Book)
+    if after_id is not None:
+        stmt = stmt.where(Book.id > after_id)
+    stmt = stmt.order_by(Book.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+def _reviews_page_stmt(book_id: int, limit: Optional[int], before: Optional[Tuple[datetime, int]], columns=None):
+    stmt = (select(*columns) if columns else select(Review)).where(Review.book_id == book_id)
+    if before is not None:
+        created_at, review_id = before
+        stmt = stmt.where(or_(
+            Review.created_at < created_at,
+            and_(Review.created_at == created_at, Review.id < review_id),
+        ))
+    stmt = stmt.order_by(Review.created_at.desc(), Review.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+# Columns for the record readers below, which return plain dicts shaped like
+# schemas.BookRecord / ReviewRecord instead of ORM instances
+_BOOK_RECORD_COLUMNS = (
+    Book.title, Book.author, Book.isbn, Book.publication_year, Book.description, Book.id, Book.created_at,
+    Book.review_count, Book.rating_sum,
+    Book.rating_1_count, Book.rating_2_count, Book.rating_3_count, Book.rating_4_count, Book.rating_5_count,
+)
+_REVIEW_RECORD_COLUMNS = (
+    Review.reviewer_name, Review.rating, Review.comment, Review.id, Review.book_id, Review.created_at,
+)
+
+_REVIEW_RECORD_FIELDS = tuple(column.key for column in _REVIEW_RECORD_COLUMNS)
+
+def _book_record(row) -> Dict:
+    # Same values as the ORM properties Book.average_rating / rating_histogram
+    (title, author, isbn, publication_year, description, id_, created_at,
+     review_count, rating_sum, *histogram) = row[:len(_BOOK_RECORD_COLUMNS)]
+    return {
+        "title": title, "author": author, "isbn": isbn, "publication_year": publication_year,
+        "description": description, "id": id_, "created_at": created_at, "review_count": review_count,
+        "average_rating": round(rating_sum / review_count, 2) if review_count else None,
+        "rating_histogram": histogram,
+    }
+
+def _book_records(rows) -> List[Dict]:
+    return [_book_record(row) for row in rows]
+
+def _review_records(rows) -> List[Dict]:
+    return [dict(row) for row in rows.mappings()]
+
+# Every book joined to its reviews, newest first, in the composite index's order
+_BOOKS_WITH_REVIEWS_STMT = (
+    select(*_BOOK_RECORD_COLUMNS, *[column.label(f"review_{column.key}") for column in _REVIEW_RECORD_COLUMNS])
+    .outerjoin(Review, Review.book_id == Book.id)
+    .order_by(Book.id, Review.created_at.desc(), Review.id.desc())
+)
+_ALL_REVIEWS_STMT = (
+    select(*_REVIEW_RECORD_COLUMNS)
+    .order_by(Review.book_id, Review.created_at.desc(), Review.id.desc())
+)
+
+def _book_records_by_ids_stmt(book_ids: Iterable[int]):
+    return select(*_BOOK_RECORD_COLUMNS).where(Book.id.in_(list(book_ids)))
+
+def _first_review_pages_stmt(book_ids: Iterable[int], limit: int):
+    # One round trip, but each book's page is still its own index range scan
+    # that stops after `limit` rows, unlike a window function over every review.
+    # SQLite caps compound SELECTs at 500 terms by default; callers send at most 200.
+    pages = [_reviews_page_stmt(book_id, limit, None, _REVIEW_RECORD_COLUMNS).subquery() for book_id in book_ids]
+    return union_all(*[select(*page.c) for page in pages])
+
+def _group_review_pages(rows) -> Dict[int, List[Dict]]:
+    pages = {}
+    for review in _review_records(rows):
+        pages.setdefault(review["book_id"], []).append(review)
+    # UNION ALL doesn't promise to keep each branch's order
+    for page in pages.values():
+        page.sort(key=lambda review: (review["created_at"], review["id"]), reverse=True)
+    return pages
+
+def _book_with_reviews_stmt(book_id: int, reviews_limit: int):
+    # selectinload fetches every related row, so bound it to the first page
+    # of reviews; the page is re-sorted in Python since the load is unordered
+    first_page_ids = _reviews_page_stmt(book_id, reviews_limit, None, (Review.id,))
+    return (
+        select(Book)
+        .where(Book.id == book_id)
+        .options(selectinload(Book.reviews.and_(Review.id.in_(first_page_ids))))
+    )
+
+def _newest_first(reviews) -> List[Review]:
+    return sorted(reviews, key=lambda review: (review.created_at, review.id), reverse=True)
+
+def _rating_count_column(rating: int):
+    return getattr(Book, f"rating_{rating}_count")
+
+def _add_rating_stmt(book_id: int, rating: int):
+    # Increment in SQL so concurrent reviews on the same book can't lose updates
+    count_column = _rating_count_column(rating)
+    return (
+        update(Book)
+        .where(Book.id == book_id)
+        .values({
+            Book.review_count: Book.review_count + 1,
+            Book.rating_sum: Book.rating_sum + rating,
+            count_column: count_column + 1,
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+# Fold many books' rating deltas in with one executemany; Core table so the
+# rows are plain parameter sets rather than ORM bulk-update-by-PK
+_books_table = Book.__table__
+_ADD_RATINGS_STMT = (
+    update(_books_table)
+    .where(_books_table.c.id == bindparam("b_id"))
+    .values({
+        _books_table.c.review_count: _books_table.c.review_count + bindparam("b_count"),
+        _books_table.c.rating_sum: _books_table.c.rating_sum + bindparam("b_sum"),
+        **{
+            _books_table.c[f"rating_{n}_count"]: _books_table.c[f"rating_{n}_count"] + bindparam(f"b_{n}")
+            for n in range(1, 6)
+        },
+    })
+)
+
+def _rating_deltas(reviews: List[ReviewImport]) -> List[Dict]:
+    deltas = {}
+    for review in reviews:
+        delta = deltas.get(review.book_id)
+        if delta is None:
+            delta = deltas[review.book_id] = {
+                "b_id": review.book_id, "b_count": 0, "b_sum": 0, **{f"b_{n}": 0 for n in range(1, 6)}
+            }
+        delta["b_count"] += 1
+        delta["b_sum"] += review.rating
+        delta[f"b_{review.rating}"] += 1
+    return list(deltas.values())
+
+# Insert reviews and read back their ids and timestamps in the same
+# statement, in parameter order
+_INSERT_REVIEW_RECORDS_STMT = insert(Review.__table__).returning(
+    *[Review.__table__.c[field] for field in _REVIEW_RECORD_FIELDS], sort_by_parameter_order=True
+)
+
+def _existing_book_ids_stmt(book_ids: Iterable[int]):
+    return select(Book.id).where(Book.id.in_(list(book_ids)))
+
+def _stats_delta_stmt(**deltas: int):
+    return (
+        update(ServiceStats)
+        .where(ServiceStats.id == STATS_ROW_ID)
+        .values({getattr(ServiceStats, name): getattr(ServiceStats, name) + delta for name, delta in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+
+# Columns a bulk import may overwrite when a row's isbn already exists;
+# rating aggregates and created_at are left alone
+_BOOK_UPSERT_COLUMNS = ("title", "author", "publication_year", "description")
+
+def _dialect_insert(dialect: str):
+    return postgresql.insert if dialect == "postgresql" else sqlite.insert
+
+def _insert_new_books_stmt(dialect: str):
+    # RETURNING only yields the rows actually inserted, so the database's own
+    # conflict resolution says which books are new, even under concurrent imports
+    table = Book.__table__
+    return _dialect_insert(dialect)(table).on_conflict_do_nothing(index_elements=[table.c.isbn]).returning(table.c.isbn)
+
+def _upsert_books_stmt(dialect: str):
+    table = Book.__table__
+    stmt = _dialect_insert(dialect)(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.isbn],
+        set_={column: stmt.excluded[column] for column in _BOOK_UPSERT_COLUMNS},
+    ).returning(table.c.id)
+
+def _conflicting_rows(rows: List[Dict], inserted_isbns: List[Optional[str]]) -> List[Dict]:
+    """The rows an insert skipped: those with an isbn it didn't return."""
+    inserted = set(inserted_isbns)
+    return [row for row in rows if row["isbn"] is not None and row["isbn"] not in inserted]
+
+def _dedupe_by_isbn(books: List[BookCreate]) -> List[Dict]:
+    # Later lines win, as if the batch had been applied one row at a time
+    rows, by_isbn = [], {}
+    for book in books:
+        row = book.model_dump()
+        if row["isbn"] is None:
+            rows.append(row)
+        else:
+            by_isbn[row["isbn"]] = row
+    return rows + list(by_isbn.values())
+
+_BOOK_TOTAL_STMT = select(func.count(Book.id))
+_REVIEW_TOTALS_STMT = select(func.count(Review.id), func.coalesce(func.sum(Review.rating), 0))
+
+def _apply_stats_totals(stats: ServiceStats, total_books: int, review_totals) -> ServiceStats:
+    stats.total_books = total_books
+    stats.total_reviews, stats.rating_sum = review_totals
+    return stats
+
+_RATING_AGGREGATES_STMT = (
+    select(
+        Review.book_id.label("id"),
+        func.count(Review.id).label("review_count"),
+        func.sum(Review.rating).label("rating_sum"),
+        *[
+            func.sum(case((Review.rating == n, 1), else_=0)).label(f"rating_{n}_count")
+            for n in range(1, 6)
+        ],
+    )
+    .group_by(Review.book_id)
+)
+
+_ZERO_RATINGS_STMT = (
+    update(Book)
+    .values({"review_count": 0, "rating_sum": 0, **{f"rating_{n}_count": 0 for n in range(1, 6)}})
+    .execution_options(synchronize_session=False)
+)
+
+# Sync API
+
+def get_books(db: Session, limit: Optional[int] = None, after_id: Optional[int] = None) -> List[Book]:
+    """Get books ordered by id, optionally one keyset page starting after `after_id`."""
+    return list(db.scalars(_books_page_stmt(limit, after_id)))
+
+def get_book_with_reviews(db: Session, book_id: int, reviews_limit: int) -> Tuple[Optional[Book], List[Review]]:
+    """Get a book and its newest `reviews_limit` reviews (newest first) in two queries, or (None, [])."""
+    book = db.scalars(_book_with_reviews_stmt(book_id, reviews_limit)).first()
+    return (book, _newest_first(book.reviews)) if book is not None else (None, [])
+
+def get_book_records(db: Session, limit: Optional[int] = None, after_id: Optional[int] = None) -> List[Dict]:
+    """Like get_books, but fetch only the serialized columns and return plain dicts."""
+    return _book_records(db.execute(_books_page_stmt(limit, after_id, _BOOK_RECORD_COLUMNS)))
+
+def iter_book_records(db: Session, batch_size: int = 1000) -> Iterator[Dict]:
+    """Stream every book as a record, by id, fetching `batch_size` rows at a time."""
+    stmt = _books_page_stmt(None, None, _BOOK_RECORD_COLUMNS).execution_options(yield_per=batch_size)
+    for row in db.execute(stmt):
+        yield _book_record(row)
+
+def iter_book_records_with_reviews(db: Session, batch_size: int = 1000) -> Iterator[Dict]:
+    """Like iter_book_records, with each record's reviews (newest first) under "reviews".
+
+    Reads one joined stream, so only one book's reviews are held at a time.
+    """
+    current = None
+    review_start = len(_BOOK_RECORD_COLUMNS)
+    for row in db.execute(_BOOKS_WITH_REVIEWS_STMT.execution_options(yield_per=batch_size)):
+        if current is None or current["id"] != row.id:
+            if current is not None:
+                yield current
+            current = _book_record(row)
+            current["reviews"] = []
+        if row.review_id is not None:
+            current["reviews"].append(dict(zip(_REVIEW_RECORD_FIELDS, row[review_start:])))
+    if current is not None:
+        yield current
+
+def iter_review_records(db: Session, batch_size: int = 1000) -> Iterator[Dict]:
+    """Stream every review as a record, grouped by book, fetching `batch_size` rows at a time."""
+    for row in db.execute(_ALL_REVIEWS_STMT.execution_options(yield_per=batch_size)).mappings():
+        yield dict(row)
+
+def get_book_records_by_ids(db: Session, book_ids: Iterable[int]) -> List[Dict]:
+    """Get the books among `book_ids` as records, in one query. Unknown ids are skipped."""
+    return _book_records(db.execute(_book_records_by_ids_stmt(book_ids)))
+
+def get_first_review_pages(db: Session, book_ids: List[int], limit: int) -> Dict[int, List[Dict]]:
+    """Get up to `limit` newest reviews for each of `book_ids` in one query, keyed by book id.
+
+    Books without reviews (or that don't exist) are absent.
+    """
+    if not book_ids:
+        return {}
+    return _group_review_pages(db.execute(_first_review_pages_stmt(book_ids, limit)))
 
 def get_book(db: Session, book_id: int) -> Book:
     """Get a specific book by ID."""
-    return db.query(Book).filter(Book.id == book_id).first()
+    return db.get(Book, book_id)
+
+def _bump_stats(db: Session, **deltas: int) -> None:
+    """Add deltas to the running totals row inside the caller's transaction."""
+    updated = db.execute(_stats_delta_stmt(**deltas)).rowcount
+    if not updated:
+        # First write ever (or the row was removed): seed it from the tables,
+        # which already include the pending row flushed below
+        db.flush()
+        _recompute_stats_row(db)
+
+def _recompute_stats_row(db: Session) -> ServiceStats:
+    stats = db.get(ServiceStats, STATS_ROW_ID) or ServiceStats(id=STATS_ROW_ID)
+    _apply_stats_totals(stats, db.scalar(_BOOK_TOTAL_STMT), db.execute(_REVIEW_TOTALS_STMT).one())
+    db.add(stats)
+    return stats
+
+def get_stats(db: Session) -> ServiceStats:
+    """Get the running totals row, building it from the tables if it does not exist yet."""
+    stats = db.get(ServiceStats, STATS_ROW_ID)
+    if stats is None:
+        stats = _recompute_stats_row(db)
+        db.commit()
+    return stats
+
+def rebuild_stats(db: Session) -> ServiceStats:
+    """Recompute the running totals from the books and reviews tables to repair drift."""
+    stats = _recompute_stats_row(db)
+    db.commit()
+    return stats
 
 def create_book(db: Session, book: BookCreate) -> Book:
     """Create a new book."""
     db_book = Book(**book.model_dump())
     db.add(db_book)
+    _bump_stats(db, total_books=1)
     db.commit()
     db.refresh(db_book)
     return db_book
 
-def get_reviews_by_book(db: Session, book_id: int) -> List[Review]:
-    """Get all reviews for a specific book."""
-    return db.query(Review).filter(Review.book_id == book_id).order_by(Review.created_at.desc()).all()
+def upsert_books(db: Session, books: List[BookCreate]) -> Tuple[int, List[int]]:
+    """Insert a batch of books in one transaction, updating rows whose isbn already exists.
+
+    Returns (number inserted, ids of the books updated).
+    """
+    rows = _dedupe_by_isbn(books)
+    dialect = db.get_bind().dialect.name
+    inserted_isbns = list(db.scalars(_insert_new_books_stmt(dialect), rows))
+    # The rest already exist: update them in place
+    conflicting = _conflicting_rows(rows, inserted_isbns)
+    updated_ids = list(db.scalars(_upsert_books_stmt(dialect), conflicting)) if conflicting else []
+    inserted = len(inserted_isbns)
+    if inserted:
+        _bump_stats(db, total_books=inserted)
+    db.commit()
+    return inserted, updated_ids
+
+def get_reviews_by_book(
+    db: Session,
+    book_id: int,
+    limit: Optional[int] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+) -> List[Review]:
+    """Get reviews for a specific book, newest first, optionally one keyset page older than `before`."""
+    return list(db.scalars(_reviews_page_stmt(book_id, limit, before)))
+
+def get_review_records(
+    db: Session,
+    book_id: int,
+    limit: Optional[int] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+) -> List[Dict]:
+    """Like get_reviews_by_book, but fetch only the serialized columns and return plain dicts."""
+    return _review_records(db.execute(_reviews_page_stmt(book_id, limit, before, _REVIEW_RECORD_COLUMNS)))
 
 def create_review(db: Session, review: ReviewCreate, book_id: int) -> Review:
-    """Create a new review for a book."""
+    """Create a new review for a book and fold it into the book's rating aggregates."""
     db_review = Review(**review.model_dump(), book_id=book_id)
     db.add(db_review)
+    db.execute(_add_rating_stmt(book_id, review.rating))
+    _bump_stats(db, total_reviews=1, rating_sum=review.rating)
     db.commit()
     db.refresh(db_review)
     return db_review
+
+def get_existing_book_ids(db: Session, book_ids: Iterable[int]) -> Set[int]:
+    """Which of `book_ids` exist, in one query."""
+    return set(db.scalars(_existing_book_ids_stmt(book_ids)))
+
+def create_reviews(db: Session, reviews: List[ReviewImport]) -> None:
+    """Insert a batch of reviews for existing books in one transaction, folding them into the aggregates."""
+    # Core executemany on the table: no per-row ORM bookkeeping
+    db.execute(insert(Review.__table__), [review.model_dump() for review in reviews])
+    db.execute(_ADD_RATINGS_STMT, _rating_deltas(reviews))
+    _bump_stats(db, total_reviews=len(reviews), rating_sum=sum(review.rating for review in reviews))
+    db.commit()
+
+def create_review_records(db: Session, reviews: List[ReviewImport]) -> List[Dict]:
+    """Like create_reviews, but return the inserted reviews as records, in input order."""
+    records = _review_records(db.execute(_INSERT_REVIEW_RECORDS_STMT, [review.model_dump() for review in reviews]))
+    db.execute(_ADD_RATINGS_STMT, _rating_deltas(reviews))
+    _bump_stats(db, total_reviews=len(reviews), rating_sum=sum(review.rating for review in reviews))
+    db.commit()
+    return records
+
+def rebuild_rating_aggregates(db: Session) -> int:
+    """Recompute every book's rating aggregates from the reviews table. Returns books updated."""
+    rows = [row._asdict() for row in db.execute(_RATING_AGGREGATES_STMT)]
+    db.execute(_ZERO_RATINGS_STMT)
+    if rows:
+        db.execute(update(Book), rows)
+    db.commit()
+    return len(rows)
+
+# Async API, mirroring the sync functions above
+
+async def get_books_async(db: AsyncSession, limit: Optional[int] = None, after_id: Optional[int] = None) -> List[Book]:
+    """Async variant of get_books."""
+    return list(await db.scalars(_books_page_stmt(limit, after_id)))
+
+async def get_book_with_reviews_async(
+    db: AsyncSession, book_id: int, reviews_limit: int
+) -> Tuple[Optional[Book], List[Review]]:
+    """Async variant of get_book_with_reviews."""
+    book = (await db.scalars(_book_with_reviews_stmt(book_id, reviews_limit))).first()
+    return (book, _newest_first(book.reviews)) if book is not None else (None, [])
+
+async def get_book_records_async(db: AsyncSession, limit: Optional[int] = None, after_id: Optional[int] = None) -> List[Dict]:
+    """Async variant of get_book_records."""
+    return _book_records(await db.execute(_books_page_stmt(limit, after_id, _BOOK_RECORD_COLUMNS)))
+
+async def get_book_records_by_ids_async(db: AsyncSession, book_ids: Iterable[int]) -> List[Dict]:
+    """Async variant of get_book_records_by_ids."""
+    return _book_records(await db.execute(_book_records_by_ids_stmt(book_ids)))
+
+async def get_first_review_pages_async(db: AsyncSession, book_ids: List[int], limit: int) -> Dict[int, List[Dict]]:
+    """Async variant of get_first_review_pages."""
+    if not book_ids:
+        return {}
+    return _group_review_pages(await db.execute(_first_review_pages_stmt(book_ids, limit)))
+
+async def get_book_async(db: AsyncSession, book_id: int) -> Book:
+    """Async variant of get_book."""
+    return await db.get(Book, book_id)
+
+async def _bump_stats_async(db: AsyncSession, **deltas: int) -> None:
+    updated = (await db.execute(_stats_delta_stmt(**deltas))).rowcount
+    if not updated:
+        await db.flush()
+        await _recompute_stats_row_async(db)
+
+async def _recompute_stats_row_async(db: AsyncSession) -> ServiceStats:
+    stats = await db.get(ServiceStats, STATS_ROW_ID) or ServiceStats(id=STATS_ROW_ID)
+    review_totals = (await db.execute(_REVIEW_TOTALS_STMT)).one()
+    _apply_stats_totals(stats, await db.scalar(_BOOK_TOTAL_STMT), review_totals)
+    db.add(stats)
+    return stats
+
+async def get_stats_async(db: AsyncSession) -> ServiceStats:
+    """Async variant of get_stats."""
+    stats = await db.get(ServiceStats, STATS_ROW_ID)
+    if stats is None:
+        stats = await _recompute_stats_row_async(db)
+        await db.commit()
+    return stats
+
+async def rebuild_stats_async(db: AsyncSession) -> ServiceStats:
+    """Async variant of rebuild_stats."""
+    stats = await _recompute_stats_row_async(db)
+    await db.commit()
+    return stats
+
+async def create_book_async(db: AsyncSession, book: BookCreate) -> Book:
+    """Async variant of create_book."""
+    db_book = Book(**book.model_dump())
+    db.add(db_book)
+    await _bump_stats_async(db, total_books=1)
+    await db.commit()
+    await db.refresh(db_book)
+    return db_book
+
+async def upsert_books_async(db: AsyncSession, books: List[BookCreate]) -> Tuple[int, List[int]]:
+    """Async variant of upsert_books."""
+    rows = _dedupe_by_isbn(books)
+    dialect = db.get_bind().dialect.name
+    inserted_isbns = list(await db.scalars(_insert_new_books_stmt(dialect), rows))
+    conflicting = _conflicting_rows(rows, inserted_isbns)
+    updated_ids = list(await db.scalars(_upsert_books_stmt(dialect), conflicting)) if conflicting else []
+    inserted = len(inserted_isbns)
+    if inserted:
+        await _bump_stats_async(db, total_books=inserted)
+    await db.commit()
+    return inserted, updated_ids
+
+async def get_reviews_by_book_async(
+    db: AsyncSession,
+    book_id: int,
+    limit: Optional[int] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+) -> List[Review]:
+    """Async variant of get_reviews_by_book."""
+    return list(await db.scalars(_reviews_page_stmt(book_id, limit, before)))
+
+async def get_review_records_async(
+    db: AsyncSession,
+    book_id: int,
+    limit: Optional[int] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+) -> List[Dict]:
+    """Async variant of get_review_records."""
+    return _review_records(await db.execute(_reviews_page_stmt(book_id, limit, before, _REVIEW_RECORD_COLUMNS)))
+
+async def create_review_async(db: AsyncSession, review: ReviewCreate, book_id: int) -> Review:
+    """Async variant of create_review."""
+    db_review = Review(**review.model_dump(), book_id=book_id)
+    db.add(db_review)
+    await db.execute(_add_rating_stmt(book_id, review.rating))
+    await _bump_stats_async(db, total_reviews=1, rating_sum=review.rating)
+    await db.commit()
+    await db.refresh(db_review)
+    return db_review
+
+async def get_existing_book_ids_async(db: AsyncSession, book_ids: Iterable[int]) -> Set[int]:
+    """Async variant of get_existing_book_ids."""
+    return set(await db.scalars(_existing_book_ids_stmt(book_ids)))
+
+async def create_reviews_async(db: AsyncSession, reviews: List[ReviewImport]) -> None:
+    """Async variant of create_reviews."""
+    await db.execute(insert(Review.__table__), [review.model_dump() for review in reviews])
+    await db.execute(_ADD_RATINGS_STMT, _rating_deltas(reviews))
+    await _bump_stats_async(db, total_reviews=len(reviews), rating_sum=sum(review.rating for review in reviews))
+    await db.commit()
+
+async def create_review_records_async(db: AsyncSession, reviews: List[ReviewImport]) -> List[Dict]:
+    """Async variant of create_review_records."""
+    records = _review_records(
+        await db.execute(_INSERT_REVIEW_RECORDS_STMT, [review.model_dump() for review in reviews])
+    )
+    await db.execute(_ADD_RATINGS_STMT, _rating_deltas(reviews))
+    await _bump_stats_async(db, total_reviews=len(reviews), rating_sum=sum(review.rating for review in reviews))
+    await db.commit()
+    return records
+
+async def rebuild_rating_aggregates_async(db: AsyncSession) -> int:
+    """Async variant of rebuild_rating_aggregates."""
+    rows = [row._asdict() for row in await db.execute(_RATING_AGGREGATES_STMT)]
+    await db.execute(_ZERO_RATINGS_STMT)
+    if rows:
+        await db.execute(update(Book), rows)
+    await db.commit()
+    return len(rows)
@@ -1,31 +1,202 @@
-from sqlalchemy import create_engine
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base  # ✅ Fix: import declarative_base
 import os
-import redis
+import random
+import time
+import redis.asyncio as redis
+
+from metrics import TimedRedis
 
 # ✅ Expose Base so other modules like models.py or conftest.py can use it
 Base = declarative_base()
 
-# Redis setup
-redis_client = redis.Redis(host="localhost", port=6379, db=0, decode_responses=True)
+# Redis setup: one non-blocking client over an explicit, bounded connection pool.
+# Short timeouts keep a slow or unreachable Redis from holding requests hostage;
+# every caller already treats Redis errors as a cache miss.
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))
+
+def _redis_pool(decode_responses: bool) -> redis.ConnectionPool:
+    return redis.ConnectionPool.from_url(
+        REDIS_URL,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        health_check_interval=30,
+        decode_responses=decode_responses,
+    )
+
+redis_pool = _redis_pool(decode_responses=True)
+redis_client = TimedRedis(redis.Redis(connection_pool=redis_pool))
+
+# The response cache stores bodies that may be gzip-compressed, so it needs
+# replies as raw bytes rather than decoded text
+redis_binary_pool = _redis_pool(decode_responses=False)
+redis_binary_client = TimedRedis(redis.Redis(connection_pool=redis_binary_pool))
+
+# GET /stats mirrors the service_stats row in this hash. Every bump also
+# increments the version key, and the hash is only filled from SQL if the
+# version hasn't moved since before the SQL read, so a fill can never store
+# totals that miss a write committed in between.
+STATS_KEY = "stats"
+STATS_VERSION_KEY = "stats:version"
 
 # Database URL - defaults to SQLite
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./book_reviews.db")
 
-# SQLite engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=False
-)
+# Read replicas, as comma-separated URLs. GET handlers read from one of them,
+# picked per session; writes, and reads by a client that has just written,
+# go to the primary at DATABASE_URL. With none, everything uses the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# After a write, a client's reads go to the primary for this long, so it sees
+# its own write however far the replicas lag (see READ_YOUR_WRITES_COOKIE)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "primary_until"
+
+# SQLite performance profile, applied to every new connection. WAL lets
+# readers proceed while a write commits, NORMAL sync is durable in WAL mode
+# except across power loss, and the memory map and page cache keep hot pages
+# out of read() calls. SQLITE_PROFILE=default keeps SQLite's own settings.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "performance")
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024))),  # negative: KiB, not pages
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+def is_sqlite(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+def install_sqlite_pragmas(engine: Engine, pragmas: dict = SQLITE_PRAGMAS):
+    """Apply `pragmas` to each connection `engine` opens (the sync_engine, for an async engine)."""
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def engine_options(url: str, env_prefix: str) -> dict:
+    """Pool settings for one engine: {env_prefix}POOL_SIZE, MAX_OVERFLOW, POOL_RECYCLE, POOL_PRE_PING."""
+    options = {
+        "pool_pre_ping": os.getenv(f"{env_prefix}POOL_PRE_PING", "false").lower() in ("1", "true", "yes"),
+        "pool_recycle": int(os.getenv(f"{env_prefix}POOL_RECYCLE", "-1")),
+    }
+    # SQLite engines pick their own pool classes, which don't all take a size
+    if make_url(url).get_backend_name() != "sqlite":
+        options["pool_size"] = int(os.getenv(f"{env_prefix}POOL_SIZE", "5"))
+        options["max_overflow"] = int(os.getenv(f"{env_prefix}MAX_OVERFLOW", "10"))
+    return options
+
+def make_engine(url: str, env_prefix: str) -> Engine:
+    options = engine_options(url, env_prefix)
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    new_engine = create_engine(url, echo=False, **options)
+    if is_sqlite(new_engine) and SQLITE_PROFILE == "performance":
+        install_sqlite_pragmas(new_engine)
+    return new_engine
+
+def make_async_engine(url: str, env_prefix: str) -> AsyncEngine:
+    new_engine = create_async_engine(url, echo=False, **engine_options(url, env_prefix))
+    if is_sqlite(new_engine.sync_engine) and SQLITE_PROFILE == "performance":
+        install_sqlite_pragmas(new_engine.sync_engine)
+    return new_engine
+
+# Async drivers for the same databases
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its async counterpart."""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Primary engines: all writes, and reads when there are no replicas
+engine = make_engine(DATABASE_URL, "DB_")
+async_engine = make_async_engine(ASYNC_DATABASE_URL, "DB_")
+
+# Replica engines, each with its own pool (DB_REPLICA_POOL_SIZE, ...)
+read_engines = [make_engine(url, "DB_REPLICA_") for url in DATABASE_REPLICA_URLS]
+async_read_engines = [make_async_engine(to_async_url(url), "DB_REPLICA_") for url in DATABASE_REPLICA_URLS]
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Dependency for FastAPI routes
+# Async session factory; objects stay usable after commit for response serialization
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+read_session_factories = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in read_engines]
+async_read_session_factories = [
+    async_sessionmaker(e, autoflush=False, expire_on_commit=False) for e in async_read_engines
+]
+
+# Dependency for scripts and sync code paths
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+# Dependency for FastAPI routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency for work that may outlive the request, such as background cache
+# refreshes, which must open their own sessions
+def get_async_session_factory():
+    return AsyncSessionLocal
+
+# Dependency for sync work run off the event loop, such as streaming exports,
+# which open their own sessions for as long as the response streams
+def get_session_factory():
+    return SessionLocal
+
+def reads_pinned_to_primary(request: Request) -> bool:
+    """Whether the client wrote within the last READ_YOUR_WRITES_SECONDS.
+
+    The cookie is client-supplied, so a value further ahead than a write could
+    have set (plus a second of clock skew between workers) is ignored; otherwise
+    any client could pin itself to the primary, past the cache, for good.
+    """
+    try:
+        pinned_until = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, "0"))
+    except ValueError:
+        return False
+    now = time.time()
+    return now < pinned_until <= now + READ_YOUR_WRITES_SECONDS + 1
+
+# Read-only dependencies: a replica, unless there are none or the client has
+# just written. They build on the primary dependencies above, so overriding
+# those (as the tests do) covers reads too.
+def get_async_read_session_factory(request: Request, primary=Depends(get_async_session_factory)):
+    if not async_read_session_factories or reads_pinned_to_primary(request):
+        return primary
+    return random.choice(async_read_session_factories)
+
+async def get_async_read_db(session_factory=Depends(get_async_read_session_factory)):
+    async with session_factory() as db:
+        yield db
+
+def get_read_session_factory(request: Request, primary=Depends(get_session_factory)):
+    if not read_session_factories or reads_pinned_to_primary(request):
+        return primary
+    return random.choice(read_session_factories)
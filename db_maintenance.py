@@ -0,0 +1,110 @@
+"""
+Periodic SQLite upkeep: WAL checkpoints and planner statistics
+
+In WAL mode SQLite checkpoints automatically after each 1000-page commit,
+but only when no reader holds an old snapshot, so under steady read load the
+WAL can keep growing. A periodic PASSIVE checkpoint copies whatever it can
+without blocking anyone. Planner statistics are refreshed with a bounded
+ANALYZE (analysis_limit rows per index), which stays cheap on large tables;
+`PRAGMA optimize` on its own only analyzes tables its connection has queried,
+which a maintenance connection never has.
+
+Usage (one pass, e.g. from cron):
+    python db_maintenance.py
+"""
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from database import engine, is_sqlite
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_INTERVAL = float(os.getenv("SQLITE_CHECKPOINT_INTERVAL", "300"))
+OPTIMIZE_INTERVAL = float(os.getenv("SQLITE_OPTIMIZE_INTERVAL", "3600"))
+ANALYSIS_LIMIT = int(os.getenv("SQLITE_ANALYSIS_LIMIT", "1000"))
+
+
+def checkpoint(engine: Engine):
+    """Run a PASSIVE WAL checkpoint. Returns (busy, wal_frames, checkpointed_frames)."""
+    with engine.connect() as conn:
+        return tuple(conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one())
+
+
+def optimize(engine: Engine):
+    """Refresh planner statistics with a bounded ANALYZE, then let SQLite apply them."""
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+        conn.execute(text("ANALYZE"))
+        conn.exec_driver_sql("PRAGMA optimize")
+        conn.commit()
+
+
+class SqliteMaintenance:
+    """Runs checkpoint and optimize on their intervals in a background task.
+
+    The work itself runs in a thread so the event loop keeps serving requests.
+    """
+
+    def __init__(self, engine: Engine, checkpoint_interval: float = CHECKPOINT_INTERVAL,
+                 optimize_interval: float = OPTIMIZE_INTERVAL):
+        self.engine = engine
+        self.checkpoint_interval = checkpoint_interval
+        self.optimize_interval = optimize_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_checkpoint = loop.time() + self.checkpoint_interval
+        next_optimize = loop.time() + self.optimize_interval
+        while True:
+            await asyncio.sleep(max(0.0, min(next_checkpoint, next_optimize) - loop.time()))
+            now = loop.time()
+            if now >= next_checkpoint:
+                next_checkpoint = now + self.checkpoint_interval
+                try:
+                    busy, wal_frames, copied = await asyncio.to_thread(checkpoint, self.engine)
+                    logger.info(f"🧾 WAL checkpoint: {copied}/{wal_frames} frames copied{' (busy)' if busy else ''}")
+                except Exception as e:
+                    logger.warning(f"⚠️ WAL checkpoint failed: {e}")
+            if now >= next_optimize:
+                next_optimize = now + self.optimize_interval
+                try:
+                    await asyncio.to_thread(optimize, self.engine)
+                    logger.info("📊 Refreshed SQLite planner statistics")
+                except Exception as e:
+                    logger.warning(f"⚠️ SQLite optimize failed: {e}")
+
+    def start(self):
+        if is_sqlite(self.engine) and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+sqlite_maintenance = SqliteMaintenance(engine)
+
+
+def main():
+    if not is_sqlite(engine):
+        print("ℹ️ Not a SQLite database; nothing to do")
+        return
+    busy, wal_frames, copied = checkpoint(engine)
+    print(f"✅ WAL checkpoint: {copied}/{wal_frames} frames copied{' (busy)' if busy else ''}")
+    optimize(engine)
+    print("✅ Planner statistics refreshed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Streaming exports of books and reviews as NDJSON or CSV.
+
+Rows are read through server-side cursors (yield_per) and written out in
+chunks of about CHUNK_BYTES, so memory stays flat however large the export
+is. NDJSON lines use the same JSON shapes as the API; CSV flattens the
+rating histogram into one column per star and, with reviews inlined, writes
+one row per review with the book's columns repeated.
+"""
+import csv
+import io
+from typing import Callable, Iterable, Iterator, List
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from crud import iter_book_records, iter_book_records_with_reviews, iter_review_records
+from schemas import BookWithReviewsRecord, book_record_adapter, review_record_adapter
+
+CHUNK_BYTES = 64 * 1024
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+BOOK_CSV_FIELDS = [
+    "id", "title", "author", "isbn", "publication_year", "description", "created_at",
+    "review_count", "average_rating", *[f"rating_{n}_count" for n in range(1, 6)],
+]
+REVIEW_CSV_FIELDS = ["id", "book_id", "reviewer_name", "rating", "comment", "created_at"]
+
+_book_with_reviews_adapter = TypeAdapter(BookWithReviewsRecord)
+
+
+def _chunked(pieces: Iterable[bytes]) -> Iterator[bytes]:
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _ndjson(records: Iterable[dict], adapter: TypeAdapter) -> Iterator[bytes]:
+    for record in records:
+        yield adapter.dump_json(record) + b"\n"
+
+
+def _csv(header: List[str], rows: Iterable[list]) -> Iterator[bytes]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        yield out.getvalue().encode()
+        out.seek(0)
+        out.truncate()
+    yield out.getvalue().encode()
+
+
+def _book_row(book: dict) -> list:
+    return [
+        book["id"], book["title"], book["author"], book["isbn"], book["publication_year"], book["description"],
+        book["created_at"].isoformat(), book["review_count"], book["average_rating"], *book["rating_histogram"],
+    ]
+
+
+def _review_row(review: dict) -> list:
+    return [
+        review["id"], review["book_id"], review["reviewer_name"], review["rating"], review["comment"],
+        review["created_at"].isoformat(),
+    ]
+
+
+def _book_with_review_rows(books: Iterable[dict]) -> Iterator[list]:
+    empty = [None] * len(REVIEW_CSV_FIELDS)
+    for book in books:
+        row = _book_row(book)
+        if not book["reviews"]:
+            yield row + empty
+        for review in book["reviews"]:
+            yield row + _review_row(review)
+
+
+def export_books(db: Session, fmt: str = "ndjson", include_reviews: bool = False, batch_size: int = 1000) -> Iterator[bytes]:
+    """Stream every book, optionally with its reviews, as NDJSON or CSV chunks."""
+    if include_reviews:
+        books = iter_book_records_with_reviews(db, batch_size)
+        if fmt == "csv":
+            header = BOOK_CSV_FIELDS + [f"review_{field}" for field in REVIEW_CSV_FIELDS]
+            return _chunked(_csv(header, _book_with_review_rows(books)))
+        return _chunked(_ndjson(books, _book_with_reviews_adapter))
+    books = iter_book_records(db, batch_size)
+    if fmt == "csv":
+        return _chunked(_csv(BOOK_CSV_FIELDS, map(_book_row, books)))
+    return _chunked(_ndjson(books, book_record_adapter))
+
+
+def export_reviews(db: Session, fmt: str = "ndjson", batch_size: int = 1000) -> Iterator[bytes]:
+    """Stream every review, grouped by book, as NDJSON or CSV chunks."""
+    reviews = iter_review_records(db, batch_size)
+    if fmt == "csv":
+        return _chunked(_csv(REVIEW_CSV_FIELDS, map(_review_row, reviews)))
+    return _chunked(_ndjson(reviews, review_record_adapter))
+
+
+def stream_export(session_factory: Callable[[], Session], export: Callable[[Session], Iterator[bytes]]) -> Iterator[bytes]:
+    """Run `export` in a session of its own that lives exactly as long as the stream."""
+    db = session_factory()
+    try:
+        yield from export(db)
+    finally:
+        db.close()
@@ -0,0 +1,48 @@
+"""
+Script to export books (optionally with their reviews inlined) or reviews as NDJSON or CSV
+
+Usage:
+    python export_data.py books --format csv --include-reviews -o books.csv
+    python export_data.py reviews > reviews.ndjson
+"""
+import argparse
+import sys
+
+from database import SessionLocal
+from export import export_books, export_reviews
+
+def export_data(args):
+    """Stream the export to a file or stdout without holding it in memory"""
+    db = SessionLocal()
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+
+    try:
+        if args.dataset == "books":
+            chunks = export_books(db, args.format, include_reviews=args.include_reviews, batch_size=args.batch_size)
+        else:
+            chunks = export_reviews(db, args.format, batch_size=args.batch_size)
+        written = 0
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+        if args.output:
+            print(f"✅ Exported {args.dataset} to {args.output} ({written} bytes)", file=sys.stderr)
+    except Exception as e:
+        print(f"❌ Error exporting {args.dataset}: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.output:
+            out.close()
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", choices=["books", "reviews"])
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--include-reviews", action="store_true", help="Inline each book's reviews (books only)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows fetched per round trip")
+    parser.add_argument("-o", "--output", help="File to write (default: stdout)")
+    export_data(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 // API Configuration
 const API_BASE_URL = "http://localhost:8000"
+// Send cookies so that, after a write, the API serves our reads from the primary database
+const API_CREDENTIALS = "include"
 
 // Global state
 let books = []
+let nextCursor = null
+let searchResults = []
 let currentBookId = null
 let currentRating = 0
 
@@ -65,14 +69,17 @@ async function loadBooks() {
   showLoading(true)
 
   try {
-    const response = await fetch(`${API_BASE_URL}/books`)
+    const response = await fetch(`${API_BASE_URL}/books`, { credentials: API_CREDENTIALS })
 
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
     }
 
-    books = await response.json()
+    const page = await response.json()
+    books = page.items
+    nextCursor = page.next_cursor
     renderBooks(books)
+    updateLoadMore()
     updateStats()
 
     if (books.length === 0) {
@@ -87,6 +94,33 @@ async function loadBooks() {
   }
 }
 
+// Load the next page of books using the cursor from the previous page
+async function loadMoreBooks() {
+  if (!nextCursor) return
+
+  try {
+    const response = await fetch(`${API_BASE_URL}/books?cursor=${encodeURIComponent(nextCursor)}`, { credentials: API_CREDENTIALS })
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
+
+    const page = await response.json()
+    books = books.concat(page.items)
+    nextCursor = page.next_cursor
+    renderBooks(books)
+    updateLoadMore()
+    updateStats()
+  } catch (error) {
+    console.error("Error loading more books:", error)
+    showToast("Failed to load more books", "error")
+  }
+}
+
+function updateLoadMore() {
+  document.getElementById("loadMore").style.display = nextCursor ? "flex" : "none"
+}
+
 // Render Books
 function renderBooks(booksToRender) {
   const container = document.getElementById("booksContainer")
@@ -111,7 +145,7 @@ function renderBooks(booksToRender) {
                 </div>
                 <div class="book-rating">
                     <i class="fas fa-star"></i>
-                    <span>4.5</span>
+                    <span>${book.average_rating !== null ? book.average_rating.toFixed(1) : "–"}</span>
                 </div>
             </div>
             
@@ -125,7 +159,7 @@ function renderBooks(booksToRender) {
             <div class="book-actions">
                 <div class="review-count">
                     <i class="fas fa-comment"></i>
-                    <span>0 reviews</span>
+                    <span>${book.review_count} ${book.review_count === 1 ? "review" : "reviews"}</span>
                 </div>
                 <button class="btn btn-primary btn-sm" onclick="event.stopPropagation(); openBookDetails(${book.id})">
                     View Details
@@ -137,20 +171,39 @@ function renderBooks(booksToRender) {
     .join("")
 }
 
-// Search functionality
+// Search functionality (server-side, debounced)
+let searchTimer = null
+
 function handleSearch(event) {
-  const searchTerm = event.target.value.toLowerCase()
+  const searchTerm = event.target.value.trim()
+
+  clearTimeout(searchTimer)
 
   if (searchTerm === "") {
     renderBooks(books)
+    updateLoadMore()
     return
   }
 
-  const filteredBooks = books.filter(
-    (book) => book.title.toLowerCase().includes(searchTerm) || book.author.toLowerCase().includes(searchTerm),
-  )
+  searchTimer = setTimeout(() => searchBooks(searchTerm), 200)
+}
+
+async function searchBooks(searchTerm) {
+  try {
+    const response = await fetch(`${API_BASE_URL}/books/search?q=${encodeURIComponent(searchTerm)}`, { credentials: API_CREDENTIALS })
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
 
-  renderBooks(filteredBooks)
+    const page = await response.json()
+    searchResults = page.items
+    renderBooks(searchResults)
+    document.getElementById("loadMore").style.display = "none"
+  } catch (error) {
+    console.error("Error searching books:", error)
+    showToast("Search failed", "error")
+  }
 }
 
 // Add Book Modal
@@ -179,6 +232,7 @@ async function handleAddBook(event) {
   try {
     const response = await fetch(`${API_BASE_URL}/books`, {
       method: "POST",
+      credentials: API_CREDENTIALS,
       headers: {
         "Content-Type": "application/json",
       },
@@ -204,9 +258,22 @@ async function handleAddBook(event) {
 // Book Details Modal
 async function openBookDetails(bookId) {
   currentBookId = bookId
-  const book = books.find((b) => b.id === bookId)
 
-  if (!book) return
+  // One request for the book and its first page of reviews
+  let book
+  try {
+    const response = await fetch(`${API_BASE_URL}/books/${bookId}?include=reviews`, { credentials: API_CREDENTIALS })
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
+
+    book = await response.json()
+  } catch (error) {
+    console.error("Error loading book details:", error)
+    showToast("Failed to load book details", "error")
+    return
+  }
 
   // Update modal title and book info
   document.getElementById("bookDetailsTitle").textContent = book.title
@@ -223,8 +290,7 @@ async function openBookDetails(bookId) {
         </div>
     `
 
-  // Load reviews
-  await loadReviews(bookId)
+  renderReviews(book.reviews)
 
   document.getElementById("bookDetailsModal").classList.add("active")
 }
@@ -238,14 +304,14 @@ function closeBookDetailsModal() {
 // Load Reviews
 async function loadReviews(bookId) {
   try {
-    const response = await fetch(`${API_BASE_URL}/books/${bookId}/reviews`)
+    const response = await fetch(`${API_BASE_URL}/books/${bookId}/reviews`, { credentials: API_CREDENTIALS })
 
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
     }
 
-    const reviews = await response.json()
-    renderReviews(reviews)
+    const page = await response.json()
+    renderReviews(page.items)
   } catch (error) {
     console.error("Error loading reviews:", error)
     document.getElementById("reviewsList").innerHTML = "<p>Failed to load reviews</p>"
@@ -352,6 +418,7 @@ async function handleAddReview(event) {
   try {
     const response = await fetch(`${API_BASE_URL}/books/${currentBookId}/reviews`, {
       method: "POST",
+      credentials: API_CREDENTIALS,
       headers: {
         "Content-Type": "application/json",
       },
@@ -363,6 +430,7 @@ async function handleAddReview(event) {
     }
 
     await loadReviews(currentBookId)
+    updateStats()
     closeAddReviewForm()
     showToast("Review added successfully!", "success")
   } catch (error) {
@@ -382,11 +450,23 @@ function showEmptyState() {
   document.getElementById("booksContainer").style.display = "none"
 }
 
-function updateStats() {
-  document.getElementById("totalBooks").textContent = books.length
-  // Note: In a real app, you'd calculate these from actual review data
-  document.getElementById("totalReviews").textContent = "0"
-  document.getElementById("avgRating").textContent = "0.0"
+async function updateStats() {
+  try {
+    const response = await fetch(`${API_BASE_URL}/stats`, { credentials: API_CREDENTIALS })
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
+
+    const stats = await response.json()
+    document.getElementById("totalBooks").textContent = stats.total_books
+    document.getElementById("totalReviews").textContent = stats.total_reviews
+    document.getElementById("avgRating").textContent =
+      stats.average_rating !== null ? stats.average_rating.toFixed(1) : "0.0"
+  } catch (error) {
+    console.error("Error loading stats:", error)
+    document.getElementById("totalBooks").textContent = books.length
+  }
 }
 
 function refreshBooks() {
@@ -0,0 +1,161 @@
+# group_commit.py
+"""
+Group commit: one writer task per database that batches concurrent writes.
+
+Request handlers submit items and await a future. The writer takes everything
+queued, waits up to GROUP_COMMIT_MAX_DELAY_MS for more (up to
+GROUP_COMMIT_MAX_ITEMS per batch), writes the batch in one transaction and
+resolves each future with its own result. On SQLite this turns a burst of N
+commits, each fighting for the write lock and paying its own fsync, into a
+few commits from a single writer. A lone write waits at most the delay.
+
+If a batch fails, its items are retried one per transaction so a single bad
+item fails only its own caller. Whatever else goes wrong with a batch, its
+callers get an error rather than waiting forever, and a writer task that has
+stopped is restarted by the next submit. A caller that gives up (e.g. the client
+disconnects) doesn't withdraw its item; it is still written.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+MAX_ITEMS = int(os.getenv("GROUP_COMMIT_MAX_ITEMS", "500"))
+MAX_DELAY = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", "2")) / 1000
+MAX_QUEUED = int(os.getenv("GROUP_COMMIT_MAX_QUEUED", "10000"))
+CLOSE_TIMEOUT = 5.0
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+
+class GroupCommitter(Generic[Item, Result]):
+    """Single writer that commits queued items in batches through `write_batch`.
+
+    `write_batch(db, items)` must write and commit `items` in one transaction
+    and return one result per item, in order.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        write_batch: Callable[[AsyncSession, List[Item]], Awaitable[List[Result]]],
+        max_items: int = MAX_ITEMS,
+        max_delay: float = MAX_DELAY,
+        max_queued: int = MAX_QUEUED,
+    ):
+        self.session_factory = session_factory
+        self.write_batch = write_batch
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.max_queued = max_queued
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _start(self):
+        # Bound to the running loop on first use
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, item: Item) -> Result:
+        """Queue `item` for the next batch and wait for its result."""
+        if self._task is None:
+            self._start()
+        elif self._task.done():
+            # Nothing would drain the queue otherwise; what was queued is kept
+            logger.warning("⚠️ Group commit writer had stopped; restarting it")
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))  # waits while the queue is full
+        return await future
+
+    async def _next_batch(self, batch: List[Tuple[Item, asyncio.Future]]):
+        # Fills `batch` in place, so items taken before a cancellation can still be failed
+        batch.append(await self._queue.get())
+        if self.max_delay and self._queue.qsize() < self.max_items - 1:
+            await asyncio.sleep(self.max_delay)
+        while len(batch) < self.max_items and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run(self):
+        while True:
+            batch = []
+            try:
+                await self._next_batch(batch)
+                await self._commit(batch)
+            except asyncio.CancelledError:
+                _fail(batch, RuntimeError("Writer closed while writing this batch; it may have been committed"))
+                raise
+            except Exception as e:
+                # A bug rather than a database error, which _commit handles: fail
+                # this batch's callers and keep serving the rest
+                logger.exception(f"❌ Group commit writer failed on a batch of {len(batch)} items: {e}")
+                _fail(batch, e)
+            except BaseException as e:
+                _fail(batch, RuntimeError(f"Writer stopped: {e!r}"))
+                raise
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, items: List[Item]) -> List[Result]:
+        async with self.session_factory() as db:
+            return await self.write_batch(db, items)
+
+    async def _commit(self, batch: List[Tuple[Item, asyncio.Future]]):
+        try:
+            results = await self._write([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                _resolve(batch[0][1], error=e)
+                return
+            logger.warning(f"⚠️ Group commit of {len(batch)} items failed, retrying one by one: {e}")
+            for item, future in batch:
+                try:
+                    result = (await self._write([item]))[0]
+                except Exception as item_error:
+                    _resolve(future, error=item_error)
+                else:
+                    _resolve(future, result)
+            return
+        if len(results) != len(batch):
+            raise RuntimeError(f"write_batch returned {len(results)} results for {len(batch)} items")
+        for (_, future), result in zip(batch, results):
+            _resolve(future, result)
+
+    async def close(self):
+        """Write whatever is still queued, then stop the writer task."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Group commit writer closed with {self._queue.qsize()} items unwritten")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            _resolve(future, error=RuntimeError("Writer closed"))
+        self._task = None
+        self._queue = None
+
+
+def _fail(batch: List[Tuple[object, asyncio.Future]], error: BaseException):
+    for _, future in batch:
+        _resolve(future, error=error)
+
+
+def _resolve(future: asyncio.Future, result=None, error: Optional[BaseException] = None):
+    if future.done():  # the caller gave up waiting
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -1,44 +1,124 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
-import redis
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from typing import List, Optional, Union
 import json
+import math
+import os
+import time
+from datetime import datetime
 import logging
 from contextlib import asynccontextmanager
 
 # Avoid circular imports
-from database import get_db, engine, redis_client
+from database import (
+    get_async_db, get_async_session_factory, get_session_factory, engine, async_engine,
+    get_async_read_db, get_async_read_session_factory, get_read_session_factory, read_engines, async_read_engines,
+    READ_YOUR_WRITES_COOKIE, READ_YOUR_WRITES_SECONDS, reads_pinned_to_primary,
+    redis_client, redis_pool, redis_binary_client, redis_binary_pool, STATS_KEY, STATS_VERSION_KEY,
+)
 import models  # Register models before metadata.create_all
-from models import Book as BookModel
 from models import Base
-from schemas import BookCreate, Book, ReviewCreate, Review
+from schemas import (
+    BookCreate, Book, BookPage, BookWithReviews, ReviewCreate, ReviewImport, Review, ReviewPage, Stats,
+    BulkImportResult, BulkLineError, ReviewBatchRequest, ReviewPages,
+    book_record_adapter, book_record_page_adapter, review_record_page_adapter,
+)
 from crud import (
-    create_book, get_books, get_book,
-    create_review, get_reviews_by_book
+    create_book_async, get_book_records_async, get_book_records_by_ids_async, get_book_async,
+    get_book_with_reviews_async, upsert_books_async,
+    create_review_records_async, create_reviews_async, get_existing_book_ids_async,
+    get_first_review_pages_async, get_review_records_async, get_stats_async
 )
+from pagination import encode_cursor, decode_cursor
+from ndjson import LineTooLong, iter_lines
+from export import MEDIA_TYPES, export_books, export_reviews, stream_export
+from cache import decompress_body, is_compressed, response_cache
+from book_ids import book_ids
+from db_maintenance import sqlite_maintenance
+from group_commit import GroupCommitter
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, instrument_engine, registry
+import profiling
+from profiling import ProfilingMiddleware
+from search import ensure_search_index, search_books_async
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+JSON_MEDIA_TYPE = "application/json"
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+MAX_BULK_BATCH_SIZE = 10000
+MAX_REPORTED_ERRORS = 100
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows a gzip response."""
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        quality = 1.0
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def cached_json_response(body: bytes, request: Request) -> Response:
+    """Serve a cached JSON body, still gzipped as stored when the client accepts it."""
+    headers = {"Vary": "Accept-Encoding"}
+    if is_compressed(body):
+        if accepts_gzip(request.headers.get("accept-encoding", "")):
+            headers["Content-Encoding"] = "gzip"
+        else:
+            body = decompress_body(body)
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
 # Create tables on startup
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
     logger.info("📘 Database tables created")
 
     if redis_client:
         try:
-            redis_client.ping()
+            await redis_client.ping()
             logger.info("✅ Redis cache connected successfully")
         except Exception as e:
             logger.warning(f"⚠️ Redis is NOT available at startup: {e}")
     else:
         logger.warning("⚠️ Redis client is not configured")
 
+    response_cache.start_listener()
+    sqlite_maintenance.start()
+
     yield
 
+    await sqlite_maintenance.stop()
+    for writer in review_writers.values():
+        await writer.close()
+    await response_cache.close()
+    await async_engine.dispose()
+    for read_engine in async_read_engines:
+        await read_engine.dispose()
+    for read_engine in read_engines:
+        read_engine.dispose()
+    if redis_client:
+        await redis_client.aclose()
+        await redis_pool.disconnect()
+        await redis_binary_client.aclose()
+        await redis_binary_pool.disconnect()
+
 app = FastAPI(
     title="Book Review Service",
     description="A service for managing books and their reviews",
@@ -55,112 +135,663 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profiles requests sent with X-Profile: 1, when PROFILING_ENABLED is set
+app.add_middleware(ProfilingMiddleware)
+
+# Outermost, so request latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
+for sync_engine in (engine, async_engine.sync_engine):
+    instrument_engine(sync_engine, "primary")
+for sync_engine in (*read_engines, *(read_engine.sync_engine for read_engine in async_read_engines)):
+    instrument_engine(sync_engine, "replica")
+
 @app.get("/")
 async def root():
     return {"message": "Book Review Service API"}
 
-@app.get("/books", response_model=List[Book])
-def get_books(db: Session = Depends(get_db)):
-    cache_key = "books:all"
+# Cache tags: every cached entry is tagged with the data it was built from
+BOOKS_TAG = "books"  # any listing of books
+
+
+def book_tag(book_id: int) -> str:
+    """Tag for entries embedding one book's fields or rating aggregates."""
+    return f"book:{book_id}"
 
-    if redis_client:
-        try:
-            cached_books = redis_client.get(cache_key)
-            if cached_books:
-                logger.info("📦 Cache hit - returning books from Redis")
-                return json.loads(cached_books)
-        except Exception as e:
-            logger.warning(f"⚠️ Redis unavailable: {e}")
+
+def reviews_tag(book_id: int) -> str:
+    """Tag for entries embedding a book's reviews."""
+    return f"reviews:{book_id}"
+
+
+# Invalidated whenever books are created; nothing cached carries it, but it
+# tells every worker to forget the ids it had found missing
+BOOK_IDS_TAG = "book-ids"
+
+
+def forget_missing_books(tags):
+    if tags is None or BOOK_IDS_TAG in tags:
+        book_ids.forget_missing()
+
+
+response_cache.add_invalidation_hook(forget_missing_books)
+
+
+async def ensure_book_exists(book_id: int, db: AsyncSession):
+    """404 unless the book exists; answered from memory for ids this worker has recently seen.
+
+    `db` only checks out a connection if the database has to be asked.
+    """
+
+    async def lookup(book_id: int) -> bool:
+        return bool(await get_existing_book_ids_async(db, [book_id]))
 
     try:
-        books = db.query(BookModel).all()
-        logger.info(f"📚 Retrieved {len(books)} books from DB")
-        result = [Book.model_validate(book) for book in books]
+        found = await book_ids.exists(book_id, lookup)
     except Exception as e:
-        logger.exception(f"❌ Error during book processing: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch books")
+        logger.error(f"❌ Error checking book {book_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch book")
+    if not found:
+        raise HTTPException(status_code=404, detail="Book not found")
 
-    if redis_client:
+
+def book_detail_key(book_id: int) -> str:
+    """Cache key of one book's JSON, shared by GET /books/{id} and GET /books?ids="""
+    return f"book:{book_id}"
+
+
+def review_page_key(book_id: int, limit: int, before: Optional[str]) -> str:
+    return f"reviews:book:{book_id}:{limit}:{before or 'start'}"
+
+
+def parse_ids(raw: str) -> List[int]:
+    """Parse a comma-separated id list, dropping duplicates but keeping order."""
+    try:
+        ids = list(dict.fromkeys(int(part) for part in raw.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not 1 <= len(ids) <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"Pass between 1 and {MAX_PAGE_SIZE} ids")
+    return ids
+
+
+def reads_skip_cache(request: Request) -> bool:
+    """Whether a client that has just written should bypass the response cache.
+
+    Cached entries may have been built from a replica; a client pinned to the
+    primary reads it directly, so it always sees its own write.
+    """
+    return bool(async_read_engines) and reads_pinned_to_primary(request)
+
+
+def build_session_factory(tags, session_factory: async_sessionmaker, primary_factory: async_sessionmaker):
+    """Where to read a cache entry's data from.
+
+    Whatever is cached gets served to every client, so for READ_YOUR_WRITES_SECONDS
+    after a write to any of its tags an entry is built from the primary, which a
+    lagging replica may not have caught up with.
+    """
+    if session_factory is not primary_factory and response_cache.invalidated_within(tags, READ_YOUR_WRITES_SECONDS):
+        return primary_factory
+    return session_factory
+
+
+async def cached_or_built(request: Request, key: str, build, tags) -> bytes:
+    if reads_skip_cache(request):
+        return await build()
+    return await response_cache.get_or_build(key, build, tags=tags)
+
+
+async def cached_or_built_many(request: Request, entries, build_many) -> List[Optional[bytes]]:
+    if reads_skip_cache(request):
+        built = await build_many(list(range(len(entries))))
+        return [built.get(position) for position in range(len(entries))]
+    return await response_cache.get_or_build_many(entries, build_many)
+
+
+@app.get("/books", response_model=BookPage)
+async def get_books(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    ids: Optional[str] = Query(None, description="Comma-separated book ids to fetch instead of a page"),
+    session_factory: async_sessionmaker = Depends(get_async_read_session_factory),
+    primary_factory: async_sessionmaker = Depends(get_async_session_factory),
+):
+    if ids is not None:
+        return await get_books_by_ids(request, parse_ids(ids), session_factory, primary_factory)
+
+    after_id = None
+    if cursor:
+        try:
+            after_id = int(decode_cursor(cursor)["id"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    cache_key = f"books:page:{limit}:{cursor or 'start'}"
+
+    async def build_page() -> bytes:
         try:
-            redis_client.setex(cache_key, 300, json.dumps([b.model_dump() for b in result], default=str))
-            logger.info("✅ Books cached successfully")
+            # Fetch one extra row to learn whether another page follows
+            async with build_session_factory((BOOKS_TAG,), session_factory, primary_factory)() as db:
+                books = await get_book_records_async(db, limit=limit + 1, after_id=after_id)
+            logger.info(f"📚 Retrieved {len(books)} books from DB")
+            items = books[:limit]
+            next_cursor = encode_cursor({"id": items[-1]["id"]}) if len(books) > limit else None
+            # Plain rows serialized in one pass; same bytes as BookPage.model_dump_json()
+            return book_record_page_adapter.dump_json({"items": items, "next_cursor": next_cursor})
         except Exception as e:
-            logger.warning(f"⚠️ Failed to cache books: {e}")
+            logger.exception(f"❌ Error during book processing: {e}")
+            raise HTTPException(status_code=500, detail="Failed to fetch books")
 
-    return result
+    # Concurrent misses on the same page share a single rebuild; stale pages
+    # are served while a background task rebuilds them. The cached body is the
+    # final response, so hits skip response_model validation and serialization.
+    payload = await cached_or_built(request, cache_key, build_page, (BOOKS_TAG,))
+    return cached_json_response(payload, request)
+
+async def get_books_by_ids(
+    request: Request, ids: List[int], session_factory: async_sessionmaker, primary_factory: async_sessionmaker
+) -> Response:
+    """The books among `ids`, in request order, from one cache round trip plus one query for the misses."""
+
+    async def build_many(positions: List[int]) -> dict:
+        wanted = [ids[position] for position in positions]
+        factory = build_session_factory([book_tag(book_id) for book_id in wanted], session_factory, primary_factory)
+        try:
+            async with factory() as db:
+                records = await get_book_records_by_ids_async(db, wanted)
+            if len(records) < len(wanted) and factory is not primary_factory:
+                # A replica may not have caught up with the books' creation:
+                # only the primary can say they're missing
+                found = {record["id"] for record in records}
+                async with primary_factory() as db:
+                    records += await get_book_records_by_ids_async(
+                        db, [book_id for book_id in wanted if book_id not in found]
+                    )
+        except Exception as e:
+            logger.error(f"❌ Error fetching books by id: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to fetch books")
+        position_of = {ids[position]: position for position in positions}
+        # Same bytes as GET /books/{id}, which shares these cache entries
+        return {position_of[record["id"]]: book_record_adapter.dump_json(record) for record in records}
+
+    bodies = await cached_or_built_many(
+        request, [(book_detail_key(book_id), (book_tag(book_id),)) for book_id in ids], build_many
+    )
+    items = b",".join(decompress_body(body) for body in bodies if body is not None)
+    return Response(content=b'{"items":[' + items + b'],"next_cursor":null}', media_type=JSON_MEDIA_TYPE)
+
+@app.get("/books/search", response_model=BookPage)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    offset = 0
+    if cursor:
+        try:
+            offset = decode_cursor(cursor)["offset"]
+        except (ValueError, KeyError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Cursors are opaque, not trusted: a negative OFFSET is an error on Postgres
+        if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
 
-@app.post("/books", response_model=Book, status_code=201)
-async def add_book(book: BookCreate, db: Session = Depends(get_db)):
     try:
-        db_book = create_book(db, book)
-        if redis_client:
-            try:
-                redis_client.delete("books:all")
-                logger.info("🧹 Books cache invalidated")
-            except Exception as e:
-                logger.warning(f"⚠️ Failed to invalidate cache: {e}")
+        # Fetch one extra row to learn whether another page follows
+        books = await search_books_async(db, q, limit=limit + 1, offset=offset)
+        logger.info(f"🔎 Search {q!r} matched {len(books)} books")
+        items = [Book.model_validate(book) for book in books[:limit]]
+    except Exception as e:
+        logger.exception(f"❌ Error searching books: {e}")
+        raise HTTPException(status_code=500, detail="Failed to search books")
+
+    next_cursor = encode_cursor({"offset": offset + limit}) if len(books) > limit else None
+    return BookPage(items=items, next_cursor=next_cursor)
+
+def pin_reads_to_primary(response: Response):
+    """Send this client's reads to the primary for a few seconds, so it sees its own write."""
+    if async_read_engines or read_engines:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}",
+            max_age=math.ceil(READ_YOUR_WRITES_SECONDS), httponly=True, samesite="lax",
+        )
+
+@app.post("/books", response_model=Book, status_code=201, dependencies=[Depends(pin_reads_to_primary)])
+async def add_book(book: BookCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        db_book = await create_book_async(db, book)
+        book_ids.add(db_book.id)
+        await response_cache.invalidate_tags(BOOKS_TAG, BOOK_IDS_TAG)
+        await bump_cached_stats(total_books=1)
         return db_book
     except Exception as e:
         logger.error(f"Error creating book: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to create book")
 
-@app.get("/books/{book_id}/reviews", response_model=List[Review])
-async def get_book_reviews(book_id: int, db: Session = Depends(get_db)):
-    book = get_book(db, book_id)
-    if not book:
+def describe_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, err['loc']))}: {err['msg']}" if err["loc"] else err["msg"]
+        for err in e.errors(include_url=False)
+    )
+
+class BulkReport:
+    """Running totals for a bulk upload; keeps only the first errors so memory stays bounded."""
+
+    def __init__(self):
+        self.result = BulkImportResult()
+
+    def fail(self, line: int, error: str):
+        self.result.failed += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append(BulkLineError(line=line, error=error))
+
+async def read_ndjson_batches(request: Request, schema, batch_size: int, report: BulkReport):
+    """Yield lists of (line_number, record) validated against `schema`, recording bad lines in `report`."""
+    batch = []
+    try:
+        async for line_number, line in iter_lines(request.stream()):
+            try:
+                batch.append((line_number, schema.model_validate_json(line)))
+            except ValidationError as e:
+                report.fail(line_number, describe_validation_error(e))
+                continue
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    except LineTooLong as e:
+        # Can't find where the next record starts: stop reading here
+        report.fail(e.line_number, str(e))
+    if batch:
+        yield batch
+
+@app.post("/books/bulk", response_model=BulkImportResult, dependencies=[Depends(pin_reads_to_primary)])
+async def bulk_import_books(
+    request: Request,
+    batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Import an NDJSON stream of books, one BookCreate object per line, upserting on isbn."""
+    report = BulkReport()
+    result = report.result
+
+    async for batch in read_ndjson_batches(request, BookCreate, batch_size, report):
+        try:
+            inserted, updated_ids = await upsert_books_async(db, [book for _, book in batch])
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"❌ Bulk import batch at line {batch[0][0]} failed: {e}")
+            for line_number, _ in batch:
+                report.fail(line_number, "Batch rejected by the database")
+            continue
+        result.inserted += inserted
+        result.updated += len(updated_ids)
+
+        # Caches and stats follow each committed batch, so an upload that
+        # breaks off later (e.g. the client disconnects) leaves none stale
+        tags = [book_tag(book_id) for book_id in updated_ids]
+        if inserted:
+            tags += [BOOKS_TAG, BOOK_IDS_TAG]
+        elif updated_ids:
+            tags.append(BOOKS_TAG)
+        if tags:
+            await response_cache.invalidate_tags(*tags)
+        if inserted:
+            await bump_cached_stats(total_books=inserted)
+
+    logger.info(f"📥 Bulk import: {result.inserted} inserted, {result.updated} updated, {result.failed} failed")
+    return result
+
+def review_page_cursor(created_at: datetime, review_id: int) -> str:
+    """`before` cursor continuing a book's reviews after the given (last shown) review."""
+    return encode_cursor({"created_at": created_at.isoformat(), "id": review_id})
+
+@app.get("/books/{book_id}", response_model=Union[BookWithReviews, Book])
+async def get_book_detail(
+    request: Request,
+    book_id: int,
+    include: Optional[str] = Query(None, pattern="^reviews$"),
+    reviews_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session_factory: async_sessionmaker = Depends(get_async_read_session_factory),
+    primary_factory: async_sessionmaker = Depends(get_async_session_factory),
+):
+    """Get one book; with include=reviews, also its first page of reviews, in a single response."""
+    if book_ids.is_missing(book_id):
         raise HTTPException(status_code=404, detail="Book not found")
 
-    cache_key = f"reviews:book:{book_id}"
+    include_reviews = include == "reviews"
+    if include_reviews:
+        cache_key = f"{book_detail_key(book_id)}:reviews:{reviews_limit}"
+        tags = (book_tag(book_id), reviews_tag(book_id))
+    else:
+        cache_key = book_detail_key(book_id)
+        tags = (book_tag(book_id),)
 
-    if redis_client:
+    async def load(factory: async_sessionmaker):
+        async with factory() as db:
+            if include_reviews:
+                # Fetch one extra review to learn whether another page follows
+                return await get_book_with_reviews_async(db, book_id, reviews_limit + 1)
+            return await get_book_async(db, book_id), []
+
+    async def build_detail() -> bytes:
+        factory = build_session_factory(tags, session_factory, primary_factory)
+        try:
+            book, reviews = await load(factory)
+            if book is None and factory is not primary_factory:
+                # A replica may not have caught up with the book's creation:
+                # only the primary can say it's missing
+                book, reviews = await load(primary_factory)
+        except Exception as e:
+            logger.error(f"❌ Error fetching book {book_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to fetch book")
+        if book is None:
+            book_ids.mark_missing(book_id)
+            raise HTTPException(status_code=404, detail="Book not found")
+        book_ids.add(book_id)
+
+        detail = Book.model_validate(book)
+        if not include_reviews:
+            return detail.model_dump_json().encode()
+        page = reviews[:reviews_limit]
+        next_cursor = review_page_cursor(page[-1].created_at, page[-1].id) if len(reviews) > reviews_limit else None
+        return BookWithReviews.model_construct(
+            **dict(detail),
+            reviews=[Review.model_validate(review) for review in page],
+            reviews_next_cursor=next_cursor,
+        ).model_dump_json().encode()
+
+    payload = await cached_or_built(request, cache_key, build_detail, tags)
+    return cached_json_response(payload, request)
+
+def review_page_body(reviews: List[dict], limit: int) -> bytes:
+    """Serialize a reviews page from up to `limit` + 1 records, the extra one signalling a next page."""
+    items = reviews[:limit]
+    next_cursor = None
+    if len(reviews) > limit:
+        last = items[-1]
+        next_cursor = review_page_cursor(last["created_at"], last["id"])
+    return review_record_page_adapter.dump_json({"items": items, "next_cursor": next_cursor})
+
+@app.get("/books/{book_id}/reviews", response_model=ReviewPage)
+async def get_book_reviews(
+    request: Request,
+    book_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    session_factory: async_sessionmaker = Depends(get_async_read_session_factory),
+    primary_factory: async_sessionmaker = Depends(get_async_session_factory),
+):
+    # Existence is checked on the primary: a lagging replica would get a
+    # just-created book remembered as missing
+    await ensure_book_exists(book_id, db)
+
+    before_key = None
+    if before:
+        try:
+            values = decode_cursor(before)
+            before_key = (datetime.fromisoformat(values["created_at"]), int(values["id"]))
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    cache_key = review_page_key(book_id, limit, before)
+
+    async def build_page() -> bytes:
         try:
-            cached_reviews = redis_client.get(cache_key)
-            if cached_reviews:
-                logger.info(f"📦 Cache hit - reviews for book {book_id}")
-                return json.loads(cached_reviews)
+            # Fetch one extra row to learn whether another page follows
+            factory = build_session_factory((reviews_tag(book_id),), session_factory, primary_factory)
+            async with factory() as refresh_db:
+                reviews = await get_review_records_async(refresh_db, book_id, limit=limit + 1, before=before_key)
+            return review_page_body(reviews, limit)
         except Exception as e:
-            logger.warning(f"⚠️ Redis unavailable during GET: {e}")
+            logger.error(f"❌ Error fetching reviews: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to fetch reviews")
+
+    payload = await cached_or_built(request, cache_key, build_page, (reviews_tag(book_id),))
+    return cached_json_response(payload, request)
+
+
+# Single writer per database for new reviews: concurrent submissions are
+# committed together in one transaction (see group_commit.py)
+review_writers = {}
+
+def get_review_writer(session_factory: async_sessionmaker = Depends(get_async_session_factory)) -> GroupCommitter:
+    writer = review_writers.get(session_factory)
+    if writer is None:
+        writer = review_writers[session_factory] = GroupCommitter(session_factory, create_review_records_async)
+    return writer
+
+@app.post(
+    "/books/{book_id}/reviews", response_model=Review, status_code=201, dependencies=[Depends(pin_reads_to_primary)]
+)
+async def add_book_review(
+    book_id: int,
+    review: ReviewCreate,
+    db: AsyncSession = Depends(get_async_db),
+    writer: GroupCommitter = Depends(get_review_writer),
+):
+    await ensure_book_exists(book_id, db)
 
     try:
-        reviews = get_reviews_by_book(db, book_id)
-        result = [Review.model_validate(r) for r in reviews]
+        new_review = await writer.submit(ReviewImport(**review.model_dump(), book_id=book_id))
+        await bump_cached_stats(total_reviews=1, rating_sum=review.rating)
 
-        if redis_client:
-            try:
-                redis_client.setex(
-                    cache_key, 300, json.dumps([r.model_dump() for r in result], default=str)
-                )
-                logger.info(f"✅ Cached reviews for book {book_id}")
-            except Exception as e:
-                logger.warning(f"⚠️ Failed to cache reviews: {e}")
+        # Invalidate cached reviews, and everything carrying this book's rating aggregates
+        await response_cache.invalidate_tags(reviews_tag(book_id), book_tag(book_id), BOOKS_TAG)
 
-        return result
+        return new_review
     except Exception as e:
-        logger.error(f"❌ Error fetching reviews: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to fetch reviews")
+        logger.error(f"Error creating review: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to create review")
 
 
-@app.post("/books/{book_id}/reviews", response_model=Review, status_code=201)
-async def add_book_review(book_id: int, review: ReviewCreate, db: Session = Depends(get_db)):
-    book = get_book(db, book_id)
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
+@app.post("/reviews/batch", response_model=ReviewPages)
+async def get_review_pages(
+    request: Request,
+    batch: ReviewBatchRequest,
+    session_factory: async_sessionmaker = Depends(get_async_read_session_factory),
+    primary_factory: async_sessionmaker = Depends(get_async_session_factory),
+):
+    """The first page of reviews for each of several books, sharing GET /books/{id}/reviews's cache entries."""
+    wanted_ids = list(dict.fromkeys(batch.book_ids))
+    limit = batch.limit
+
+    async def build_many(positions: List[int]) -> dict:
+        wanted = [wanted_ids[position] for position in positions]
+        try:
+            factory = build_session_factory([reviews_tag(book_id) for book_id in wanted], session_factory, primary_factory)
+            async with factory() as db:
+                # Fetch one extra review per book to learn whether another page follows
+                pages = await get_first_review_pages_async(db, wanted, limit + 1)
+            # Books without reviews still get an empty page, if they exist.
+            # Existence is checked on the primary, which a lagging replica
+            # may not have caught up with.
+            unreviewed = [book_id for book_id in wanted if book_id not in pages]
+            existing = set()
+            if unreviewed:
+                async with primary_factory() as db:
+                    existing = await get_existing_book_ids_async(db, unreviewed)
+        except Exception as e:
+            logger.error(f"❌ Error fetching review pages: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to fetch reviews")
+        return {
+            position: review_page_body(pages.get(wanted_ids[position], []), limit)
+            for position in positions
+            if wanted_ids[position] in pages or wanted_ids[position] in existing
+        }
+
+    bodies = await cached_or_built_many(
+        request, [(review_page_key(book_id, limit, None), (reviews_tag(book_id),)) for book_id in wanted_ids],
+        build_many,
+    )
+    pages = b",".join(
+        b'"%d":' % book_id + decompress_body(body) for book_id, body in zip(wanted_ids, bodies) if body is not None
+    )
+    return Response(content=b'{"pages":{' + pages + b"}}", media_type=JSON_MEDIA_TYPE)
+
+@app.post("/reviews/bulk", response_model=BulkImportResult, dependencies=[Depends(pin_reads_to_primary)])
+async def bulk_import_reviews(
+    request: Request,
+    batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Import an NDJSON stream of reviews, one ReviewImport object (a review plus its book_id) per line."""
+    report = BulkReport()
+    result = report.result
+    reviewed_books = set()
 
+    async for batch in read_ndjson_batches(request, ReviewImport, batch_size, report):
+        known = None
+        try:
+            # One query validates every book_id in the batch
+            known = await get_existing_book_ids_async(db, {review.book_id for _, review in batch})
+            accepted = [review for _, review in batch if review.book_id in known]
+            if accepted:
+                await create_reviews_async(db, accepted)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"❌ Bulk review batch at line {batch[0][0]} failed: {e}")
+            for line_number, review in batch:
+                if known is None or review.book_id in known:
+                    report.fail(line_number, "Batch rejected by the database")
+                else:
+                    report.fail(line_number, f"Book {review.book_id} not found")
+            continue
+        for line_number, review in batch:
+            if review.book_id not in known:
+                report.fail(line_number, f"Book {review.book_id} not found")
+        if not accepted:
+            continue
+        result.inserted += len(accepted)
+        batch_books = {review.book_id for review in accepted}
+        reviewed_books |= batch_books
+
+        # Caches and stats follow each committed batch, so an upload that
+        # breaks off later (e.g. the client disconnects) leaves none stale
+        await bump_cached_stats(total_reviews=len(accepted), rating_sum=sum(review.rating for review in accepted))
+        tags = [BOOKS_TAG]
+        for book_id in batch_books:
+            tags += [reviews_tag(book_id), book_tag(book_id)]
+        await response_cache.invalidate_tags(*tags)
+
+    logger.info(f"📥 Bulk reviews: {result.inserted} inserted for {len(reviewed_books)} books, {result.failed} failed")
+    return result
+
+
+def export_response(session_factory: sessionmaker, export, name: str, fmt: str) -> StreamingResponse:
+    # A sync generator: Starlette pulls each chunk in the threadpool, so the
+    # blocking cursor reads never stall the event loop
+    return StreamingResponse(
+        stream_export(session_factory, export),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+@app.get("/export/books")
+def export_all_books(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    include: Optional[str] = Query(None, pattern="^reviews$"),
+    session_factory: sessionmaker = Depends(get_read_session_factory),
+):
+    """Stream the whole catalog as NDJSON or CSV, optionally with each book's reviews inlined."""
+    include_reviews = include == "reviews"
+    return export_response(
+        session_factory,
+        lambda db: export_books(db, fmt, include_reviews=include_reviews),
+        "books_with_reviews" if include_reviews else "books",
+        fmt,
+    )
+
+@app.get("/export/reviews")
+def export_all_reviews(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    session_factory: sessionmaker = Depends(get_read_session_factory),
+):
+    """Stream every review as NDJSON or CSV."""
+    return export_response(session_factory, lambda db: export_reviews(db, fmt), "reviews", fmt)
+
+
+STATS_FIELDS = ("total_books", "total_reviews", "rating_sum")
+STATS_TTL = 300
+
+# Bumps the version, then applies the deltas only if the hash is there to apply them to
+BUMP_STATS_SCRIPT = """
+redis.call("incr", KEYS[2])
+if redis.call("exists", KEYS[1]) == 1 then
+    for i = 1, #ARGV, 2 do
+        redis.call("hincrby", KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+return 1
+"""
+
+# Fills the hash only if no bump happened since the version was read (ARGV[1])
+FILL_STATS_SCRIPT = """
+if (redis.call("get", KEYS[2]) or "") ~= ARGV[1] then
+    return 0
+end
+redis.call("hset", KEYS[1], unpack(ARGV, 3))
+redis.call("expire", KEYS[1], ARGV[2])
+return 1
+"""
+
+async def bump_cached_stats(**deltas: int):
+    """Apply committed deltas to the Redis stats hash; drop it on failure so it is rebuilt from SQL."""
+    if not redis_client:
+        return
     try:
-        new_review = create_review(db, review, book_id)
+        args = [value for field, delta in deltas.items() for value in (field, delta)]
+        await redis_client.eval(BUMP_STATS_SCRIPT, 2, STATS_KEY, STATS_VERSION_KEY, *args)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to update cached stats: {e}")
+        try:
+            await redis_client.delete(STATS_KEY)
+        except Exception:
+            pass
+
+@app.get("/stats", response_model=Stats)
+async def get_stats(db: AsyncSession = Depends(get_async_db)):
+    totals = None
+    version = None
+
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hgetall(STATS_KEY)
+            pipe.get(STATS_VERSION_KEY)
+            cached, version = await pipe.execute()
+            if cached and all(field in cached for field in STATS_FIELDS):
+                logger.info("📦 Cache hit - stats")
+                totals = {field: int(cached[field]) for field in STATS_FIELDS}
+        except Exception as e:
+            logger.warning(f"⚠️ Redis unavailable: {e}")
+
+    if totals is None:
+        try:
+            row = await get_stats_async(db)
+            totals = {field: getattr(row, field) for field in STATS_FIELDS}
+        except Exception as e:
+            logger.error(f"❌ Error fetching stats: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to fetch stats")
 
-        # Invalidate cached reviews
         if redis_client:
             try:
-                redis_client.delete(f"reviews:book:{book_id}")
-                logger.info(f"🧹 Invalidated review cache for book {book_id}")
+                args = [value for field, total in totals.items() for value in (field, total)]
+                await redis_client.eval(
+                    FILL_STATS_SCRIPT, 2, STATS_KEY, STATS_VERSION_KEY, version or "", STATS_TTL, *args
+                )
             except Exception as e:
-                logger.warning(f"⚠️ Failed to invalidate review cache: {e}")
+                logger.warning(f"⚠️ Failed to cache stats: {e}")
 
-        return new_review
-    except Exception as e:
-        logger.error(f"Error creating review: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to create review")
+    average = round(totals["rating_sum"] / totals["total_reviews"], 2) if totals["total_reviews"] else None
+    return Stats(
+        total_books=totals["total_books"],
+        total_reviews=totals["total_reviews"],
+        average_rating=average,
+    )
 
 
 @app.get("/health")
@@ -168,7 +799,7 @@ async def health_check():
     redis_status = "not configured"
     if redis_client:
         try:
-            redis_client.ping()
+            await redis_client.ping()
             redis_status = "connected"
         except Exception:
             redis_status = "disconnected"
@@ -179,18 +810,35 @@ async def health_check():
         "redis": redis_status
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Counters and latency histograms in the Prometheus text format."""
+    return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/debug-profiles", include_in_schema=False)
+async def debug_profiles():
+    """Summaries of recent profiled requests, newest first."""
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return [profile.summary() for profile in reversed(profiling.recent_profiles.values())]
+
+@app.get("/debug-profiles/{profile_id}", include_in_schema=False)
+async def debug_profile(profile_id: str):
+    """Full report for one profiled request: its SQL statements and cProfile output."""
+    profile = profiling.recent_profiles.get(profile_id) if profiling.PROFILING_ENABLED else None
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.report()
+
 @app.get("/debug-cache")
 async def debug_cache():
-    if redis_client:
-        try:
-            data = redis_client.get("books:all")
-            return {
-                "present": bool(data),
-                "content": json.loads(data) if data else None
-            }
-        except Exception as e:
-            return {"error": str(e)}
-    return {"redis": "disabled"}
+    data = await response_cache.get(f"books:page:{DEFAULT_PAGE_SIZE}:start", tags=(BOOKS_TAG,))
+    return {
+        "present": bool(data),
+        "content": json.loads(decompress_body(data)) if data else None,
+        "l1_entries": len(response_cache.local),
+        "l1_bytes": response_cache.local.size_bytes,
+    }
 
 if __name__ == "__main__":
     import uvicorn
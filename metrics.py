@@ -0,0 +1,329 @@
+# metrics.py
+"""
+Dependency-free metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms keep one small list per label set behind a
+lock, so recording a sample is a dict lookup and a few additions, cheap
+enough to leave on at full load. Histograms have fixed buckets and record a
+sample with one bisect.
+
+Instrumentation lives here too:
+- MetricsMiddleware times every HTTP request by route template, not raw
+  path, so ids and cursors don't multiply the series.
+- instrument_engine counts SQL statements and pool checkouts through
+  SQLAlchemy engine and pool events.
+- TimedRedis wraps a redis.asyncio client to time every round trip.
+- The response cache counts its own hits, misses and errors.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette adds the charset
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """(suffix, label names, label values, value) for each sample to render."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [("_total", self.labelnames, labels, value) for labels, value in items]
+
+
+class Gauge(Metric):
+    """A value that goes up and down, or is read at scrape time from `collect`."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        if self.collect is not None:
+            values.update(self.collect())
+        return [("", self.labelnames, labels, value) for labels, value in values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        # Per label set: [count in each bucket (non-cumulative), ..., +Inf, sum]
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return sum(state[:-1]) if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        bucket_names = self.labelnames + ("le",)
+        samples = []
+        for labels, state in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (float("inf"),), state):
+                cumulative += hits
+                samples.append(("_bucket", bucket_names, labels + (_format_value(bound),), cumulative))
+            samples.append(("_sum", self.labelnames, labels, state[-1]))
+            samples.append(("_count", self.labelnames, labels, cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=(), collect=None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, collect))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode()
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests", "HTTP requests by route template and status.", ("method", "route", "status"))
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+cache_requests = registry.counter(
+    "cache_requests", "Response cache lookups by key family and result (l1_hit, hit, miss).", ("family", "result"))
+cache_errors = registry.counter(
+    "cache_errors", "Response cache operations that failed against Redis.", ("operation",))
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "SQL statement latency by engine and statement type.", ("engine", "statement"),
+    buckets=FAST_BUCKETS)
+db_pool_checkouts = registry.counter(
+    "db_pool_checkouts", "Connections checked out of the pool.", ("engine",))
+db_pool_connects = registry.counter(
+    "db_pool_connects", "New database connections opened by the pool.", ("engine",))
+db_pool_checked_out = registry.gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool.", ("engine",))
+redis_command_duration = registry.histogram(
+    "redis_command_duration_seconds", "Redis round-trip latency by command.", ("command",), buckets=FAST_BUCKETS)
+redis_errors = registry.counter(
+    "redis_errors", "Redis commands that raised.", ("command",))
+
+
+def cache_key_family(key: str) -> str:
+    """The leading non-id segments of a cache key: "reviews:book:42:50:start" -> "reviews:book"."""
+    family = []
+    for segment in key.split("@", 1)[0].split(":"):
+        if not segment.isalpha():
+            break
+        family.append(segment)
+    return ":".join(family) or "other"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each request under its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - started, method, path)
+            http_requests.inc(method, path, str(status))
+
+
+_STATEMENT_TYPE = re.compile(r"\s*(\w+)")
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Record statement latency and pool checkouts for `engine` (the sync_engine, for an async engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        match = _STATEMENT_TYPE.match(statement)
+        db_query_duration.observe(elapsed, name, match.group(1).upper() if match else "OTHER")
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    @event.listens_for(engine.pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        db_pool_connects.inc(name)
+
+    @event.listens_for(engine.pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checkouts.inc(name)
+        db_pool_checked_out.inc(name)
+
+    @event.listens_for(engine.pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        db_pool_checked_out.dec(name)
+
+
+class _TimedPipeline:
+    def __init__(self, pipeline):
+        self._pipeline = pipeline
+
+    def __getattr__(self, name):
+        return getattr(self._pipeline, name)
+
+    async def execute(self, *args, **kwargs):
+        return await _timed("pipeline", self._pipeline.execute, args, kwargs)
+
+
+async def _timed(command: str, call, args, kwargs):
+    started = time.perf_counter()
+    try:
+        return await call(*args, **kwargs)
+    except Exception:
+        redis_errors.inc(command)
+        raise
+    finally:
+        redis_command_duration.observe(time.perf_counter() - started, command)
+
+
+class TimedRedis:
+    """Wraps a redis.asyncio client, timing each command and pipeline round trip."""
+
+    TIMED_COMMANDS = frozenset({
+        "get", "set", "setex", "mget", "delete", "incr", "publish", "eval", "ping",
+        "hgetall", "hset", "hincrby", "expire", "exists",
+    })
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name not in self.TIMED_COMMANDS:
+            return attribute
+
+        async def timed(*args, **kwargs):
+            return await _timed(name, attribute, args, kwargs)
+
+        return timed
+
+    def pipeline(self, *args, **kwargs):
+        return _TimedPipeline(self._client.pipeline(*args, **kwargs))
@@ -14,9 +14,36 @@ class Book(Base):
     description = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
 
+    # Denormalized rating aggregates, maintained by crud.create_review and
+    # rebuilt from reviews by crud.rebuild_rating_aggregates
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_1_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5_count = Column(Integer, nullable=False, default=0, server_default="0")
+
     # Relationship
     reviews = relationship("Review", back_populates="book", cascade="all, delete-orphan")
 
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 2)
+
+    @property
+    def rating_histogram(self):
+        """Review counts for 1 through 5 stars."""
+        return [
+            self.rating_1_count or 0,
+            self.rating_2_count or 0,
+            self.rating_3_count or 0,
+            self.rating_4_count or 0,
+            self.rating_5_count or 0,
+        ]
+
 class Review(Base):
     __tablename__ = "reviews"
 
@@ -30,8 +57,18 @@ class Review(Base):
     # Relationship
     book = relationship("Book", back_populates="reviews")
 
-    # Index for optimizing fetching reviews by book
+    # Composite index serving the per-book newest-first keyset scan; its
+    # book_id prefix also covers plain lookups by book
     __table_args__ = (
-        Index('idx_reviews_book_id', 'book_id'),
+        Index('idx_reviews_book_created_id', book_id, created_at.desc(), id.desc()),
         Index('idx_reviews_created_at', 'created_at'),
     )
+
+class ServiceStats(Base):
+    """Single-row running totals behind GET /stats, updated alongside every write."""
+    __tablename__ = "service_stats"
+
+    id = Column(Integer, primary_key=True)
+    total_books = Column(Integer, nullable=False, default=0, server_default="0")
+    total_reviews = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,36 @@
+"""
+Newline-delimited JSON helpers for the streaming bulk endpoints.
+
+Uploads are split into lines as chunks arrive, so memory stays bounded by the
+longest line rather than by the size of the upload.
+"""
+from typing import AsyncIterable, AsyncIterator, Tuple
+
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class LineTooLong(ValueError):
+    """A line exceeded the size limit."""
+
+    def __init__(self, line_number: int, limit: int):
+        super().__init__(f"Line {line_number} is longer than {limit} bytes")
+        self.line_number = line_number
+
+
+async def iter_lines(chunks: AsyncIterable[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yield (line_number, line) for each non-blank line of a chunked NDJSON body, numbered from 1."""
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if len(line) > max_line_bytes:
+                raise LineTooLong(line_number, max_line_bytes)
+            if line.strip():
+                yield line_number, line
+        if len(buffer) > max_line_bytes:
+            raise LineTooLong(line_number + 1, max_line_bytes)
+    if buffer.strip():
+        yield line_number + 1, buffer
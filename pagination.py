@@ -0,0 +1,26 @@
+"""
+Opaque keyset cursors for the paginated listing endpoints.
+
+A cursor is the sort key of the last row on a page, JSON-encoded and wrapped
+in URL-safe base64 so clients treat it as an opaque token.
+"""
+import base64
+import json
+
+
+def encode_cursor(values: dict) -> str:
+    """Encode the sort key of the last row on a page into an opaque cursor."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(values, dict):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return values
@@ -0,0 +1,220 @@
+# profiling.py
+"""
+Opt-in per-request profiling and N+1 query detection.
+
+With PROFILING_ENABLED=true, a request sent with `X-Profile: 1` is profiled
+on its own:
+- cProfile runs for the length of the request (the event loop thread only,
+  so coroutines of requests served at the same time show up too; profile on
+  a quiet instance).
+- Every SQL statement the request runs is recorded with its timing, on any
+  engine, by SQLAlchemy cursor events that look up the current profile in a
+  context variable. Requests without one pay a single lookup per statement.
+
+The response carries `X-Profile-Id`, `X-Query-Count` and a `Server-Timing`
+summary, and the full report (statements, repeated statements, the top
+functions by cumulative time) is kept for GET /debug-profiles/{id}.
+
+A request running more statements than the budget (PROFILING_QUERY_BUDGET,
+or `X-Query-Budget` per request) gets `X-Query-Budget: exceeded` and a log
+warning, and the statements it ran more than once are listed, which is how
+an N+1 loop shows up. Headers are written when the response starts, so a
+streaming response's statements after that only appear in the report.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_HEADER = "x-profile"
+QUERY_BUDGET_HEADER = "x-query-budget"
+QUERY_BUDGET = int(os.getenv("PROFILING_QUERY_BUDGET", "10"))
+PROFILE_HISTORY = int(os.getenv("PROFILING_HISTORY", "50"))
+PROFILE_TOP_FUNCTIONS = 40
+MAX_RECORDED_QUERIES = 1000
+
+
+class RequestProfile:
+    """What one profiled request did: its SQL statements and, optionally, a cProfile."""
+
+    def __init__(self, method: str, path: str, budget: int):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.budget = budget
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        self.queries: List[Dict] = []
+        self.profiler: Optional[cProfile.Profile] = None
+        self.finished = False
+
+    def record_query(self, statement: str, elapsed: float, executemany: bool):
+        # Background work started by the request (e.g. a cache refresh) may
+        # outlive it; its statements don't belong to the report any more
+        if self.finished:
+            return
+        self.query_count += 1
+        self.query_time += elapsed
+        if len(self.queries) < MAX_RECORDED_QUERIES:
+            self.queries.append({
+                "sql": statement,
+                "duration_ms": round(elapsed * 1000, 3),
+                "executemany": executemany,
+            })
+
+    @property
+    def over_budget(self) -> bool:
+        return self.query_count > self.budget
+
+    def repeated_queries(self) -> List[Dict]:
+        counts = Counter(query["sql"] for query in self.queries)
+        return [{"sql": sql, "count": count} for sql, count in counts.most_common() if count > 1]
+
+    def headers(self) -> List[tuple]:
+        headers = [
+            (b"x-profile-id", self.id.encode()),
+            (b"x-query-count", str(self.query_count).encode()),
+            (b"server-timing", f'db;dur={self.query_time * 1000:.3f};desc="{self.query_count} queries"'.encode()),
+        ]
+        if self.over_budget:
+            headers.append((b"x-query-budget", b"exceeded"))
+        return headers
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+        self.finished = True
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3),
+            "query_count": self.query_count,
+            "query_ms": round(self.query_time * 1000, 3),
+            "query_budget": self.budget,
+            "over_budget": self.over_budget,
+        }
+
+    def report(self) -> Dict:
+        stats = None
+        if self.profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).strip_dirs().sort_stats("cumulative").print_stats(
+                PROFILE_TOP_FUNCTIONS)
+            stats = stream.getvalue()
+        return {
+            **self.summary(),
+            "repeated_queries": self.repeated_queries(),
+            "queries": self.queries,
+            "profile": stats,
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+# Reports of recent profiled requests, oldest first
+recent_profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+
+# Only one cProfile can hook the interpreter at a time
+_profiler_active = False
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    started = getattr(context, "_profile_started", None)
+    if profile is not None and started is not None:
+        profile.record_query(statement, time.perf_counter() - started, executemany)
+
+
+def _header(scope, name: str) -> Optional[str]:
+    encoded = name.encode()
+    for key, value in scope["headers"]:
+        if key == encoded:
+            return value.decode("latin-1")
+    return None
+
+
+def _remember(profile: RequestProfile):
+    recent_profiles[profile.id] = profile
+    while len(recent_profiles) > PROFILE_HISTORY:
+        recent_profiles.popitem(last=False)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling requests that ask for it, when profiling is enabled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not PROFILING_ENABLED
+            or _header(scope, PROFILE_HEADER) not in ("1", "true", "yes")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        global _profiler_active
+        try:
+            budget = int(_header(scope, QUERY_BUDGET_HEADER) or QUERY_BUDGET)
+        except ValueError:
+            budget = QUERY_BUDGET
+        profile = RequestProfile(scope["method"], scope["path"], budget)
+
+        async def send_with_summary(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + profile.headers()
+            await send(message)
+
+        token = _current_profile.set(profile)
+        if not _profiler_active:
+            _profiler_active = True
+            profile.profiler = cProfile.Profile()
+            profile.profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_summary)
+        finally:
+            profile.finish()
+            if profile.profiler is not None:
+                _profiler_active = False
+            _current_profile.reset(token)
+            route = scope.get("route")
+            profile.route = getattr(route, "path", None)
+            _remember(profile)
+            if profile.over_budget:
+                repeated = profile.repeated_queries()
+                worst = f"; most repeated ({repeated[0]['count']}x): {repeated[0]['sql'][:120]}" if repeated else ""
+                logger.warning(
+                    f"🐢 {profile.method} {profile.route or profile.path} ran {profile.query_count} SQL queries "
+                    f"(budget {profile.budget}), profile {profile.id}{worst}"
+                )
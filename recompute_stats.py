@@ -0,0 +1,42 @@
+"""
+Script to repair drift in the running totals behind GET /stats
+"""
+import asyncio
+
+from database import SessionLocal, STATS_KEY, STATS_VERSION_KEY, redis_client, redis_pool
+from crud import rebuild_stats
+
+async def reset_cached_stats():
+    """Drop the Redis mirror; the next GET /stats repopulates it from the corrected row"""
+    try:
+        # Bumping the version also stops a fill that read the old row from landing
+        pipe = redis_client.pipeline()
+        pipe.delete(STATS_KEY)
+        pipe.incr(STATS_VERSION_KEY)
+        await pipe.execute()
+    finally:
+        await redis_client.aclose()
+        await redis_pool.disconnect()
+
+def recompute_stats():
+    """Recount books and reviews into the stats row and reset the Redis mirror"""
+    db = SessionLocal()
+
+    try:
+        stats = rebuild_stats(db)
+        print(f"✅ Stats rebuilt: {stats.total_books} books, {stats.total_reviews} reviews")
+    except Exception as e:
+        print(f"❌ Error rebuilding stats: {e}")
+        db.rollback()
+        return
+    finally:
+        db.close()
+
+    if redis_client:
+        try:
+            asyncio.run(reset_cached_stats())
+        except Exception as e:
+            print(f"⚠️ Could not reset cached stats: {e}")
+
+if __name__ == "__main__":
+    recompute_stats()
@@ -0,0 +1,21 @@
+"""
+Script to rebuild the denormalized per-book rating aggregates from the reviews table
+"""
+from database import SessionLocal
+from crud import rebuild_rating_aggregates
+
+def reconcile_ratings():
+    """Recompute review_count, rating_sum and the star histogram for every book"""
+    db = SessionLocal()
+
+    try:
+        updated = rebuild_rating_aggregates(db)
+        print(f"✅ Rating aggregates rebuilt for {updated} reviewed books")
+    except Exception as e:
+        print(f"❌ Error rebuilding rating aggregates: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    reconcile_ratings()
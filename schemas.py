@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
+from typing_extensions import TypedDict
 
 # ✅ Use new Pydantic V2 config (ConfigDict)
 from pydantic import ConfigDict
@@ -18,9 +19,46 @@ class BookCreate(BookBase):
 class Book(BookBase):
     id: int
     created_at: datetime
+    review_count: int = 0
+    average_rating: Optional[float] = None
+    rating_histogram: List[int] = [0, 0, 0, 0, 0]
 
     model_config = ConfigDict(from_attributes=True)  # ✅ replaces class Config
 
+class BookPage(BaseModel):
+    items: List[Book]
+    next_cursor: Optional[str] = None
+
+# Plain-dict mirrors of the page schemas, in the same field order, so a
+# cache miss can serialize Core rows in one pass without building a model
+# per row. Their JSON must stay byte-identical to BookPage / ReviewPage.
+
+class BookRecord(TypedDict):
+    title: str
+    author: str
+    isbn: Optional[str]
+    publication_year: Optional[int]
+    description: Optional[str]
+    id: int
+    created_at: datetime
+    review_count: int
+    average_rating: Optional[float]
+    rating_histogram: List[int]
+
+class BookRecordPage(TypedDict):
+    items: List[BookRecord]
+    next_cursor: Optional[str]
+
+class BulkLineError(BaseModel):
+    line: int
+    error: str
+
+class BulkImportResult(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[BulkLineError] = []  # first errors only; `failed` has the full count
+
 class ReviewBase(BaseModel):
     reviewer_name: str = Field(..., min_length=1, max_length=255)
     rating: int = Field(..., ge=1, le=5)
@@ -29,6 +67,10 @@ class ReviewBase(BaseModel):
 class ReviewCreate(ReviewBase):
     pass
 
+class ReviewImport(ReviewCreate):
+    """One line of a bulk review upload."""
+    book_id: int
+
 class Review(ReviewBase):
     id: int
     book_id: int
@@ -36,5 +78,42 @@ class Review(ReviewBase):
 
     model_config = ConfigDict(from_attributes=True)  # ✅ replaces class Config
 
+class ReviewPage(BaseModel):
+    items: List[Review]
+    next_cursor: Optional[str] = None
+
+class ReviewBatchRequest(BaseModel):
+    book_ids: List[int] = Field(..., min_length=1, max_length=200)
+    limit: int = Field(50, ge=1, le=200)
+
+class ReviewPages(BaseModel):
+    pages: Dict[int, ReviewPage]  # first page per existing book; unknown ids are absent
+
+class ReviewRecord(TypedDict):
+    reviewer_name: str
+    rating: int
+    comment: Optional[str]
+    id: int
+    book_id: int
+    created_at: datetime
+
+class ReviewRecordPage(TypedDict):
+    items: List[ReviewRecord]
+    next_cursor: Optional[str]
+
+class BookWithReviewsRecord(BookRecord):
+    reviews: List[ReviewRecord]
+
+book_record_adapter = TypeAdapter(BookRecord)
+book_record_page_adapter = TypeAdapter(BookRecordPage)
+review_record_adapter = TypeAdapter(ReviewRecord)
+review_record_page_adapter = TypeAdapter(ReviewRecordPage)
+
 class BookWithReviews(Book):
-    reviews: List[Review] = []
+    reviews: List[Review] = []  # newest first, one page
+    reviews_next_cursor: Optional[str] = None  # `before` cursor for GET /books/{id}/reviews
+
+class Stats(BaseModel):
+    total_books: int
+    total_reviews: int
+    average_rating: Optional[float] = None
@@ -0,0 +1,154 @@
+"""
+Server-side full-text search over book title, author and description.
+
+SQLite uses an external-content FTS5 table kept in sync by triggers; Postgres
+uses a generated, weighted tsvector column with a GIN index. The index is
+created alongside the books table (create_all), by ensure_search_index for
+databases that predate it, and by the matching Alembic revision.
+"""
+import logging
+import re
+from typing import List
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import Book
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_TERMS = 10
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, description,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    # Title matches outrank author matches, which outrank description matches
+    "INSERT INTO books_fts(books_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')",
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+    END
+    """,
+    # Only the indexed columns: rating aggregate updates must not touch the index
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, description ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+        INSERT INTO books_fts(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_books_search_vector ON books USING GIN (search_vector)",
+]
+
+# Rank and page inside FTS5 first so only the returned page is joined to books
+SQLITE_SEARCH = text("""
+    SELECT books.* FROM (
+        SELECT rowid, rank FROM books_fts WHERE books_fts MATCH :query
+        ORDER BY rank, rowid LIMIT :limit OFFSET :offset
+    ) AS hits JOIN books ON books.id = hits.rowid
+    ORDER BY hits.rank, hits.rowid
+""")
+
+POSTGRES_SEARCH = text("""
+    SELECT books.* FROM books, to_tsquery('english', :query) AS query
+    WHERE books.search_vector @@ query
+    ORDER BY ts_rank(books.search_vector, query) DESC, books.id
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def _create_search_index(connection) -> None:
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        statements = SQLITE_DDL
+    elif dialect == "postgresql":
+        statements = POSTGRES_DDL
+    else:
+        logger.warning(f"⚠️ Full-text search is not supported on {dialect}")
+        return
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+@event.listens_for(Book.__table__, "after_create")
+def _after_books_create(target, connection, **kw):
+    _create_search_index(connection)
+
+
+@event.listens_for(Book.__table__, "after_drop")
+def _after_books_drop(target, connection, **kw):
+    # SQLite drops the triggers with the table, but the FTS table is separate
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS books_fts"))
+
+
+def ensure_search_index(engine) -> None:
+    """Create the search index on a database whose books table predates it, backfilling it."""
+    with engine.begin() as connection:
+        if connection.dialect.name == "sqlite":
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'")
+            ).first()
+            if exists:
+                return
+            _create_search_index(connection)
+            connection.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+            logger.info("🔎 Full-text search index built")
+        else:
+            _create_search_index(connection)
+
+
+def build_query(q: str, dialect: str) -> str:
+    """Turn free text into a safe prefix-matching query, or '' if it has no terms."""
+    terms = re.findall(r"\w+", q.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return ""
+    if dialect == "postgresql":
+        return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+    # Quote every term so FTS5 operators in user input are matched literally
+    return " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def _search_stmt(dialect: str, q: str, limit: int, offset: int):
+    query = build_query(q, dialect)
+    if not query:
+        return None
+    statement = POSTGRES_SEARCH if dialect == "postgresql" else SQLITE_SEARCH
+    return select(Book).from_statement(statement.bindparams(query=query, limit=limit, offset=offset))
+
+
+def search_books(db: Session, q: str, limit: int, offset: int = 0) -> List[Book]:
+    """Get books matching `q`, best match first."""
+    stmt = _search_stmt(db.get_bind().dialect.name, q, limit, offset)
+    return list(db.scalars(stmt)) if stmt is not None else []
+
+
+async def search_books_async(db: AsyncSession, q: str, limit: int, offset: int = 0) -> List[Book]:
+    """Async variant of search_books."""
+    stmt = _search_stmt(db.get_bind().dialect.name, q, limit, offset)
+    return list(await db.scalars(stmt)) if stmt is not None else []
@@ -4,10 +4,13 @@ Script to populate the database with sample data for testing
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
 from models import Base, Book, Review
+from search import ensure_search_index
+from crud import rebuild_rating_aggregates, rebuild_stats
 
 def create_tables():
     """Create all tables"""
     Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
     print("✅ Database tables created successfully!")
 
 def seed_database():
@@ -77,6 +80,10 @@ def seed_database():
         
         db.commit()
         
+        # Reviews were inserted directly, so fold them into the book aggregates
+        rebuild_rating_aggregates(db)
+        rebuild_stats(db)
+        
         print("✅ Database seeded successfully!")
         print(f"   - Created {len(created_books)} books")
         print(f"   - Created {len(reviews_data)} reviews")
@@ -1,27 +1,49 @@
+import asyncio
+import csv
+import io
+import json
+import time
 import pytest
+from unittest.mock import patch
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from starlette.requests import ClientDisconnect
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
-from main import app, get_db
+import database
+import main
+from main import app, get_async_db, get_async_session_factory, get_session_factory
 from models import Base
+from models import Book as BookModel, ServiceStats
+from ndjson import LineTooLong, iter_lines
+from pagination import encode_cursor
+from crud import get_books, get_reviews_by_book, rebuild_rating_aggregates, rebuild_stats, upsert_books
+from schemas import Book, BookCreate, BookPage, Review, ReviewPage
+from cache import response_cache
+from book_ids import book_ids
 
 # Test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
+# Each TestClient runs its own event loop, so don't pool async connections across tests
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
-app.dependency_overrides[get_db] = override_get_db
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
 
 @pytest.fixture
 def client():
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: TestingAsyncSessionLocal
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+    response_cache.local.clear()
+    book_ids.clear()
     Base.metadata.create_all(bind=engine)
     with TestClient(app) as c:
         yield c
@@ -57,7 +79,155 @@ def test_get_books_empty(client):
     """Test getting books when database is empty."""
     response = client.get("/books")
     assert response.status_code == 200
-    assert response.json() == []
+    assert response.json() == {"items": [], "next_cursor": None}
+
+def test_get_books_cursor_pagination(client):
+    """Test walking the book listing page by page with the returned cursor."""
+    for i in range(5):
+        client.post("/books", json={"title": f"Book {i}", "author": "Author"})
+
+    titles = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/books", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= 2
+        titles.extend(book["title"] for book in page["items"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert titles == [f"Book {i}" for i in range(5)]
+
+def test_get_books_invalid_cursor(client):
+    """Test that a malformed cursor is rejected."""
+    response = client.get("/books", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_search_books(client):
+    """Test ranked, prefix-matching full-text search."""
+    client.post("/books", json={"title": "Whale Songs", "author": "Ann Smith"})
+    client.post("/books", json={"title": "Moby Dick", "author": "Herman Melville",
+                                "description": "The hunt for the white whale"})
+    client.post("/books", json={"title": "Emma", "author": "Jane Austen"})
+
+    response = client.get("/books/search", params={"q": "whal"})
+    assert response.status_code == 200
+    titles = [book["title"] for book in response.json()["items"]]
+    # Title matches rank above description matches
+    assert titles == ["Whale Songs", "Moby Dick"]
+
+    response = client.get("/books/search", params={"q": "melville moby"})
+    assert [book["title"] for book in response.json()["items"]] == ["Moby Dick"]
+
+    # FTS operators in user input are treated as plain text
+    response = client.get("/books/search", params={"q": 'austen" OR NEAR('})
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+    # Crafted cursors are rejected rather than reaching the database
+    for offset in (-1, "1", 1.5, True):
+        response = client.get("/books/search", params={"q": "whale", "cursor": encode_cursor({"offset": offset})})
+        assert response.status_code == 400
+
+def test_bulk_import_books(client):
+    """Test NDJSON bulk import: batched inserts, isbn upserts and per-line errors."""
+    client.post("/books", json={"title": "Old Title", "author": "Someone", "isbn": "9780000000001"})
+    lines = [
+        '{"title": "Bulk A", "author": "Author A", "isbn": "9780000000002"}',
+        '',
+        'not json',
+        '{"title": "", "author": "Author C"}',
+        '{"title": "New Title", "author": "Someone", "isbn": "9780000000001"}',
+        '{"title": "Bulk D", "author": "Author D"}',
+        '{"title": "Bulk E", "author": "Author E", "isbn": "9780000000002"}',
+    ]
+    response = client.post("/books/bulk", params={"batch_size": 2}, content="\n".join(lines) + "\n",
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    # The second 9780000000002 line lands in a later batch and updates the row the first inserted
+    assert (result["inserted"], result["updated"], result["failed"]) == (2, 2, 2)
+    assert [error["line"] for error in result["errors"]] == [3, 4]
+    assert "title" in result["errors"][1]["error"]
+
+    titles = sorted(book["title"] for book in client.get("/books").json()["items"])
+    assert titles == ["Bulk D", "Bulk E", "New Title"]
+    assert client.get("/stats").json()["total_books"] == 3
+    assert [b["title"] for b in client.get("/books/search", params={"q": "new"}).json()["items"]] == ["New Title"]
+
+def test_bulk_import_books_invalidates_per_batch(client):
+    """Test that batches committed before an upload breaks off are visible in cached listings."""
+    assert client.get("/books").json()["items"] == []  # cached empty listing
+
+    async def broken_upload(request, schema, batch_size, report):
+        yield [(1, BookCreate(title="Committed", author="Author"))]
+        raise ClientDisconnect()
+
+    with patch("main.read_ndjson_batches", broken_upload), pytest.raises(ClientDisconnect):
+        client.post("/books/bulk", content="", headers={"Content-Type": "application/x-ndjson"})
+
+    assert [book["title"] for book in client.get("/books").json()["items"]] == ["Committed"]
+
+def test_bulk_import_reviews_reports_failed_batches(client):
+    """Test that a batch whose book lookup fails is reported per line, and earlier batches reach the caches."""
+    book_id = client.post("/books", json={"title": "Emma", "author": "Jane Austen"}).json()["id"]
+    assert client.get("/books").json()["items"][0]["review_count"] == 0  # cached listing
+
+    real_lookup = main.get_existing_book_ids_async
+    calls = 0
+
+    async def flaky_lookup(db, ids):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("database went away")
+        return await real_lookup(db, ids)
+
+    lines = [f'{{"book_id": {book_id}, "reviewer_name": "R{i}", "rating": 4}}' for i in range(4)]
+    with patch("main.get_existing_book_ids_async", flaky_lookup):
+        response = client.post("/reviews/bulk", params={"batch_size": 2}, content="\n".join(lines))
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (2, 2)
+    assert [error["line"] for error in result["errors"]] == [3, 4]
+
+    assert client.get("/books").json()["items"][0]["review_count"] == 2
+
+def test_export_books_and_reviews(client):
+    """Test streaming exports in NDJSON and CSV, with reviews inlined per book."""
+    emma = client.post("/books", json={"title": "Emma", "author": "Jane Austen"}).json()["id"]
+    client.post("/books", json={"title": "Ulysses", "author": "James Joyce", "description": "Dublin, 1904"})
+    client.post(f"/books/{emma}/reviews", json={"reviewer_name": "A", "rating": 4})
+    client.post(f"/books/{emma}/reviews", json={"reviewer_name": "B", "rating": 2})
+
+    response = client.get("/export/books")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    books = [json.loads(line) for line in response.text.splitlines()]
+    assert books == client.get("/books").json()["items"]
+
+    response = client.get("/export/books", params={"include": "reviews"})
+    books = [json.loads(line) for line in response.text.splitlines()]
+    assert [[r["reviewer_name"] for r in book["reviews"]] for book in books] == [["B", "A"], []]
+
+    response = client.get("/export/books", params={"format": "csv", "include": "reviews"})
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["title"], row["review_reviewer_name"]) for row in rows] == [("Emma", "B"), ("Emma", "A"), ("Ulysses", "")]
+    assert rows[2]["description"] == "Dublin, 1904"
+    assert rows[0]["rating_4_count"] == "1"
+
+    rows = list(csv.DictReader(io.StringIO(client.get("/export/reviews", params={"format": "csv"}).text)))
+    assert [row["reviewer_name"] for row in rows] == ["B", "A"]
+
+    assert client.get("/export/books", params={"format": "xml"}).status_code == 422
 
 def test_create_review(client):
     """Test creating a review for a book."""
@@ -86,6 +256,342 @@ def test_create_review(client):
     assert data["comment"] == review_data["comment"]
     assert data["book_id"] == book_id
 
+def test_iter_lines_limits_every_line():
+    """Test that an oversized line is rejected whether or not its newline arrives in the same chunk."""
+    async def lines(*chunks):
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+        return [line async for line in iter_lines(stream(), max_line_bytes=10)]
+
+    assert asyncio.run(lines(b'{"a": 1}\n\n{"b"', b': 2}')) == [(1, b'{"a": 1}'), (3, b'{"b": 2}')]
+    for chunks in ((b'{"a": 1}\n' + b"x" * 11 + b"\n{}\n",), (b'{"a": 1}\n' + b"x" * 6, b"x" * 5 + b"\n")):
+        with pytest.raises(LineTooLong) as excinfo:
+            asyncio.run(lines(*chunks))
+        assert excinfo.value.line_number == 2
+
+def test_bulk_import_reviews(client):
+    """Test NDJSON review import: unknown books rejected per line, aggregates and stats folded in per batch."""
+    first = client.post("/books", json={"title": "Emma", "author": "Jane Austen"}).json()["id"]
+    second = client.post("/books", json={"title": "Persuasion", "author": "Jane Austen"}).json()["id"]
+    # Cache a reviews page so the import has to invalidate it
+    assert client.get(f"/books/{first}/reviews").json()["items"] == []
+
+    lines = [
+        f'{{"book_id": {first}, "reviewer_name": "A", "rating": 5}}',
+        f'{{"book_id": 9999, "reviewer_name": "B", "rating": 4}}',
+        f'{{"book_id": {second}, "reviewer_name": "C", "rating": 2}}',
+        f'{{"book_id": {first}, "reviewer_name": "D", "rating": 7}}',
+        f'{{"book_id": {first}, "reviewer_name": "E", "rating": 3, "comment": "Fine"}}',
+    ]
+    response = client.post("/reviews/bulk", params={"batch_size": 2}, content="\n".join(lines))
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (3, 2)
+    assert [(error["line"], "not found" in error["error"]) for error in result["errors"]] == [(2, True), (4, False)]
+
+    assert [r["reviewer_name"] for r in client.get(f"/books/{first}/reviews").json()["items"]] == ["E", "A"]
+    books = {book["id"]: book for book in client.get("/books").json()["items"]}
+    assert books[first]["review_count"] == 2
+    assert books[first]["rating_histogram"] == [0, 0, 1, 0, 1]
+    assert books[second]["average_rating"] == 2.0
+    assert client.get("/stats").json() == {"total_books": 2, "total_reviews": 3, "average_rating": 3.33}
+
+def test_get_reviews_cursor_pagination(client):
+    """Test paging through a book's reviews newest first with the `before` cursor."""
+    book_id = client.post("/books", json={"title": "Dune", "author": "Frank Herbert"}).json()["id"]
+    for i in range(5):
+        client.post(f"/books/{book_id}/reviews", json={"reviewer_name": f"Reader {i}", "rating": 4})
+
+    first = client.get(f"/books/{book_id}/reviews", params={"limit": 3}).json()
+    assert [r["reviewer_name"] for r in first["items"]] == ["Reader 4", "Reader 3", "Reader 2"]
+    assert first["next_cursor"]
+
+    second = client.get(
+        f"/books/{book_id}/reviews", params={"limit": 3, "before": first["next_cursor"]}
+    ).json()
+    assert [r["reviewer_name"] for r in second["items"]] == ["Reader 1", "Reader 0"]
+    assert second["next_cursor"] is None
+
+def test_book_detail_with_reviews(client):
+    """Test the book detail endpoint, alone and with its first page of reviews inlined."""
+    book_id = client.post("/books", json={"title": "Dune", "author": "Frank Herbert"}).json()["id"]
+    for i in range(3):
+        client.post(f"/books/{book_id}/reviews", json={"reviewer_name": f"Reader {i}", "rating": 4})
+
+    book = client.get(f"/books/{book_id}").json()
+    assert book["title"] == "Dune"
+    assert "reviews" not in book
+
+    detail = client.get(f"/books/{book_id}", params={"include": "reviews", "reviews_limit": 2}).json()
+    assert detail["review_count"] == 3
+    assert [r["reviewer_name"] for r in detail["reviews"]] == ["Reader 2", "Reader 1"]
+    rest = client.get(f"/books/{book_id}/reviews", params={"before": detail["reviews_next_cursor"]}).json()
+    assert [r["reviewer_name"] for r in rest["items"]] == ["Reader 0"]
+
+    # A new review invalidates the cached detail
+    client.post(f"/books/{book_id}/reviews", json={"reviewer_name": "Reader 3", "rating": 1})
+    detail = client.get(f"/books/{book_id}", params={"include": "reviews", "reviews_limit": 2}).json()
+    assert detail["review_count"] == 4
+    assert detail["reviews"][0]["reviewer_name"] == "Reader 3"
+
+    assert client.get("/books/9999", params={"include": "reviews"}).status_code == 404
+
+def test_multi_get_books_and_review_pages(client):
+    """Test fetching several books, and the first review page of several books, in one request each."""
+    ids = [client.post("/books", json={"title": f"Book {i}", "author": "Author"}).json()["id"] for i in range(3)]
+    for i in range(3):
+        client.post(f"/books/{ids[0]}/reviews", json={"reviewer_name": f"Reader {i}", "rating": 5})
+
+    # Order follows the request, duplicates collapse and unknown ids are left out
+    books = client.get("/books", params={"ids": f"{ids[2]},9999,{ids[0]},{ids[2]}"}).json()
+    assert [b["id"] for b in books["items"]] == [ids[2], ids[0]]
+    assert books["items"][1]["review_count"] == 3
+    assert books["next_cursor"] is None
+    # Shares its cache entries with the detail endpoint, byte for byte
+    detail = client.get(f"/books/{ids[0]}").content
+    assert client.get("/books", params={"ids": str(ids[0])}).content == b'{"items":[' + detail + b'],"next_cursor":null}'
+    assert client.get("/books", params={"ids": "1,x"}).status_code == 400
+
+    batch = client.post("/reviews/batch", json={"book_ids": [ids[0], ids[1], 9999], "limit": 2}).json()
+    assert set(batch["pages"]) == {str(ids[0]), str(ids[1])}
+    first = batch["pages"][str(ids[0])]
+    assert [r["reviewer_name"] for r in first["items"]] == ["Reader 2", "Reader 1"]
+    assert first == client.get(f"/books/{ids[0]}/reviews", params={"limit": 2}).json()
+    assert batch["pages"][str(ids[1])] == {"items": [], "next_cursor": None}
+
+    # A new review invalidates that book's cached first page
+    client.post(f"/books/{ids[1]}/reviews", json={"reviewer_name": "Late", "rating": 2})
+    batch = client.post("/reviews/batch", json={"book_ids": [ids[1]], "limit": 2}).json()
+    assert batch["pages"][str(ids[1])]["items"][0]["reviewer_name"] == "Late"
+
+def test_book_existence_checked_from_memory(client):
+    """Test that known and recently missing books are answered without a database lookup."""
+    assert client.get("/books/1/reviews").status_code == 404
+    book_id = client.post("/books", json={"title": "Beloved", "author": "Toni Morrison"}).json()["id"]
+    # Creating a book clears the cached 404
+    assert book_id == 1
+    assert client.get(f"/books/{book_id}/reviews").status_code == 200
+
+    with patch("main.get_existing_book_ids_async", side_effect=AssertionError("database consulted")):
+        assert client.get(f"/books/{book_id}/reviews").status_code == 200
+        assert client.post(f"/books/{book_id}/reviews", json={"reviewer_name": "R", "rating": 5}).status_code == 201
+    assert client.get("/books/9999/reviews").status_code == 404
+    with patch("main.get_existing_book_ids_async", side_effect=AssertionError("database consulted")):
+        assert client.get("/books/9999/reviews").status_code == 404
+        assert client.post("/books/9999/reviews", json={"reviewer_name": "R", "rating": 5}).status_code == 404
+
+def test_reads_use_replica_until_client_writes(client, tmp_path):
+    """Test that GETs read from a replica, except for a client that has just written."""
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    Base.metadata.create_all(bind=create_engine(replica_url))  # an empty replica that never catches up
+    replica_engine = create_async_engine(replica_url.replace("sqlite", "sqlite+aiosqlite"), poolclass=NullPool)
+    replica = async_sessionmaker(replica_engine, expire_on_commit=False)
+
+    with patch.object(database, "async_read_session_factories", [replica]), \
+         patch("main.async_read_engines", [replica_engine]):
+        response = client.post("/books", json={"title": "Persuasion", "author": "Jane Austen"})
+        pinned_until = response.cookies["primary_until"]
+        book_id = response.json()["id"]
+        client.cookies.clear()
+
+        # Long after the write, another client's miss is built from the (lagging) replica and cached
+        with patch("main.READ_YOUR_WRITES_SECONDS", 0):
+            assert client.get("/books").json()["items"] == []
+
+        # A forged far-future pin is ignored: cached, replica-routed reads as usual
+        with patch("main.READ_YOUR_WRITES_SECONDS", 0):
+            for forged in ("inf", "1e30", str(time.time() + 3600)):
+                client.cookies.set("primary_until", forged)
+                assert client.get("/books").json()["items"] == []
+                assert client.get("/books", params={"limit": 7}).json()["items"] == []
+        client.cookies.clear()
+
+        # Pinned to the primary: the writer sees its own write past that cached page
+        client.cookies.set("primary_until", pinned_until)
+        assert len(client.get("/books").json()["items"]) == 1
+        client.cookies.clear()
+
+        # Right after a write, entries are built from the primary for every client
+        client.post("/books", json={"title": "Emma", "author": "Jane Austen"})
+        client.cookies.clear()
+        assert len(client.get("/books").json()["items"]) == 2
+
+        # An existence miss on the replica is confirmed on the primary
+        with patch("main.READ_YOUR_WRITES_SECONDS", 0):
+            assert client.get(f"/books/{book_id}").json()["title"] == "Persuasion"
+            ids = client.get("/books", params={"ids": f"{book_id},9999"}).json()["items"]
+            assert [book["id"] for book in ids] == [book_id]
+            pages = client.post("/reviews/batch", json={"book_ids": [book_id, 9999]}).json()["pages"]
+            assert pages == {str(book_id): {"items": [], "next_cursor": None}}
+
+def test_metrics_endpoint(client):
+    """Test that /metrics reports route latency and cache lookups in the Prometheus text format."""
+    book_id = client.post("/books", json={"title": "Ulysses", "author": "James Joyce"}).json()["id"]
+    for _ in range(2):
+        client.get(f"/books/{book_id}/reviews")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE http_request_duration_seconds histogram" in lines
+    count = next(line for line in lines if line.startswith(
+        'http_request_duration_seconds_count{method="GET",route="/books/{book_id}/reviews"}'))
+    assert int(count.split()[-1]) >= 2
+    assert any(line.startswith('http_requests_total{method="POST",route="/books",status="201"}') for line in lines)
+    assert any(line.startswith('cache_requests_total{family="reviews:book",result="l1_hit"}') for line in lines)
+
+def test_profiled_request_reports_queries(client):
+    """Test that a request sent with X-Profile records its SQL and flags an exceeded query budget."""
+    book_id = client.post("/books", json={"title": "Middlemarch", "author": "George Eliot"}).json()["id"]
+
+    # Ignored while profiling is disabled
+    assert "x-profile-id" not in client.get(f"/books/{book_id}/reviews", headers={"X-Profile": "1"}).headers
+
+    with patch("profiling.PROFILING_ENABLED", True):
+        response_cache.local.clear()
+        response = client.get(f"/books/{book_id}/reviews", headers={"X-Profile": "1", "X-Query-Budget": "0"})
+        assert response.status_code == 200
+        assert int(response.headers["x-query-count"]) >= 1
+        assert response.headers["x-query-budget"] == "exceeded"
+        assert response.headers["server-timing"].startswith("db;dur=")
+
+        report = client.get(f"/debug-profiles/{response.headers['x-profile-id']}").json()
+        assert report["route"] == "/books/{book_id}/reviews"
+        assert report["over_budget"] is True
+        assert report["query_count"] == len(report["queries"])
+        assert any("FROM reviews" in query["sql"] for query in report["queries"])
+        assert "cumulative" in report["profile"]
+
+        # A cached response runs no SQL at all
+        cached = client.get(f"/books/{book_id}/reviews", headers={"X-Profile": "1"})
+        assert cached.headers["x-query-count"] == "0"
+        assert "x-query-budget" not in cached.headers
+
+    assert client.get("/debug-profiles").status_code == 404
+
+def test_book_rating_aggregates(client):
+    """Test that reviews are folded into the book's count, average and histogram."""
+    book_id = client.post("/books", json={"title": "Emma", "author": "Jane Austen"}).json()["id"]
+    for rating in (5, 4, 5):
+        client.post(f"/books/{book_id}/reviews", json={"reviewer_name": "Reader", "rating": rating})
+
+    book = client.get("/books").json()["items"][0]
+    assert book["review_count"] == 3
+    assert book["average_rating"] == 4.67
+    assert book["rating_histogram"] == [0, 0, 0, 1, 2]
+
+def test_record_pages_match_model_serialization(client):
+    """Test that the Core-row miss path returns the same bytes as serializing ORM rows through the models."""
+    book_id = client.post("/books", json={"title": "Middlemarch", "author": "George Eliot",
+                                          "isbn": "9780141439549", "publication_year": 1871}).json()["id"]
+    client.post("/books", json={"title": "Silas Marner", "author": "George Eliot", "description": "Ünïcode \"quoted\""})
+    for rating in (5, 3, 4):
+        client.post(f"/books/{book_id}/reviews", json={"reviewer_name": "Reader", "rating": rating, "comment": "Hmm"})
+
+    db = TestingSessionLocal()
+    try:
+        books = BookPage(items=[Book.model_validate(b) for b in get_books(db)], next_cursor=None)
+        reviews = ReviewPage(items=[Review.model_validate(r) for r in get_reviews_by_book(db, book_id)], next_cursor=None)
+    finally:
+        db.close()
+
+    assert client.get("/books").content == books.model_dump_json().encode()
+    assert client.get(f"/books/{book_id}/reviews").content == reviews.model_dump_json().encode()
+
+def test_large_pages_served_gzipped_when_accepted(client):
+    """Test that large cached pages are sent gzipped as stored, and decompressed only for clients that refuse gzip."""
+    for i in range(20):
+        client.post("/books", json={"title": f"Book {i}", "author": "Author", "description": "A long description " * 5})
+
+    compressed = client.get("/books", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert len(compressed.json()["items"]) == 20
+
+    plain = client.get("/books", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == compressed.content
+
+    refused = client.get("/books", headers={"Accept-Encoding": "gzip;q=0, *"})
+    assert "content-encoding" not in refused.headers
+
+def test_small_pages_not_compressed(client):
+    """Test that bodies under the compression threshold are sent as-is."""
+    response = client.get("/books", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+def test_rebuild_rating_aggregates(client):
+    """Test that the reconciliation rebuilds drifted aggregates from the reviews table."""
+    book_id = client.post("/books", json={"title": "Persuasion", "author": "Jane Austen"}).json()["id"]
+    client.post(f"/books/{book_id}/reviews", json={"reviewer_name": "Reader", "rating": 3})
+
+    db = TestingSessionLocal()
+    try:
+        db.query(BookModel).filter(BookModel.id == book_id).update({"review_count": 42, "rating_3_count": 0})
+        db.commit()
+        assert rebuild_rating_aggregates(db) == 1
+        book = db.get(BookModel, book_id)
+        assert book.review_count == 1
+        assert book.rating_sum == 3
+        assert book.rating_histogram == [0, 0, 1, 0, 0]
+    finally:
+        db.close()
+
+def test_stats_counters(client):
+    """Test that /stats reflects created books and reviews."""
+    book_id = client.post("/books", json={"title": "Ulysses", "author": "James Joyce"}).json()["id"]
+    client.post("/books", json={"title": "Dubliners", "author": "James Joyce"})
+    client.post(f"/books/{book_id}/reviews", json={"reviewer_name": "Reader", "rating": 5})
+    client.post(f"/books/{book_id}/reviews", json={"reviewer_name": "Reader", "rating": 2})
+
+    response = client.get("/stats")
+    assert response.status_code == 200
+    assert response.json() == {"total_books": 2, "total_reviews": 2, "average_rating": 3.5}
+
+def test_rebuild_stats(client):
+    """Test that the recompute job repairs drifted counters."""
+    client.post("/books", json={"title": "Beloved", "author": "Toni Morrison"})
+
+    db = TestingSessionLocal()
+    try:
+        db.query(ServiceStats).update({"total_books": 99})
+        db.commit()
+        stats = rebuild_stats(db)
+        assert stats.total_books == 1
+        assert stats.total_reviews == 0
+    finally:
+        db.close()
+
+    assert client.get("/stats").json()["total_books"] == 1
+
+def test_upsert_counts_inserts_from_the_database(client):
+    """Test that an isbn a concurrent import inserts first counts as an update, keeping total_books exact."""
+    racing = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def other_import_commits_first(conn, cursor, statement, parameters, context, executemany):
+        nonlocal racing
+        if racing and statement.startswith("INSERT INTO books"):
+            racing = False
+            other = TestingSessionLocal()
+            upsert_books(other, [BookCreate(title="Kindred", author="Octavia Butler", isbn="9780000000009")])
+            other.close()
+
+    db = TestingSessionLocal()
+    try:
+        inserted, updated_ids = upsert_books(db, [
+            BookCreate(title="Kindred (2nd ed.)", author="Octavia Butler", isbn="9780000000009"),
+            BookCreate(title="Dawn", author="Octavia Butler"),
+        ])
+        assert (inserted, len(updated_ids)) == (1, 1)
+        assert db.query(ServiceStats).one().total_books == 2
+        assert db.get(BookModel, updated_ids[0]).title == "Kindred (2nd ed.)"
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", other_import_commits_first)
+
 def test_health_check(client):
     """Test the health check endpoint."""
     response = client.get("/health")